@@ -0,0 +1,278 @@
+"""
+Streaming backfill of labels over large offline post exports.
+
+Reads a CSV of posts in fixed-size chunks, labels the text of each post
+(optionally across worker processes) and appends the results to an output
+CSV. A checkpoint is written after every chunk, so memory stays flat on
+multi-gigabyte inputs and an interrupted run resumes where it stopped.
+
+Example:
+    python backfill.py test-data/input-posts-panic.csv output-csv/backfill.csv --workers 4
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from itertools import islice
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Tuple
+
+OUTPUT_FIELDS = ["post_index", "text", "labels"]
+
+# Labeler used by this process (set in each worker by _init_labeler)
+_labeler = None
+
+
+def _init_labeler(labeler_names: List[str], labeler_inputs_dir: str, similarity: float = None):
+    """Build the composite labeler once per process"""
+    global _labeler
+    from pylabel.fingerprint import FingerprintCache
+    from pylabel.multi_labeler import CompositeLabeler
+
+    def cache():
+        return FingerprintCache(similarity=similarity) if similarity else None
+
+    labelers = []
+    if "panic" in labeler_names:
+        from policy_proposal_labeler import PanicLanguageLabeler
+        labelers.append(PanicLanguageLabeler(fingerprint_cache=cache()))
+    if "automated" in labeler_names:
+        from pylabel.automated_labeler import AutomatedLabeler
+        labelers.append(AutomatedLabeler(None, labeler_inputs_dir, fingerprint_cache=cache()))
+    _labeler = CompositeLabeler(None, labelers)
+
+
+def _cache_stats() -> Dict[str, dict]:
+    """Fingerprint cache statistics of this process's labelers"""
+    return {
+        type(labeler).__name__: labeler.fingerprint_cache.stats()
+        for labeler in _labeler.labelers
+        if getattr(labeler, "fingerprint_cache", None) is not None
+    }
+
+
+def _label_row(item):
+    """Label one (index, text) pair"""
+    index, text = item
+    return index, text, _labeler.moderate_text(text)
+
+
+def _label_batch(items):
+    """Label (index, text) pairs and report this process's cache statistics"""
+    return os.getpid(), [_label_row(item) for item in items], _cache_stats()
+
+
+def merge_cache_stats(per_process: Dict[int, dict]) -> Dict[str, dict]:
+    """Sum the fingerprint cache statistics reported by each process"""
+    totals = {}
+    for stats in per_process.values():
+        for name, cache in stats.items():
+            total = totals.setdefault(name, {"entries": 0, "hits": 0, "misses": 0})
+            for key in total:
+                total[key] += cache[key]
+    for total in totals.values():
+        lookups = total["hits"] + total["misses"]
+        total["hit_rate"] = round(total["hits"] / lookups, 4) if lookups else 0.0
+    return totals
+
+
+def read_checkpoint(path: str) -> Dict[str, int]:
+    """Load the checkpoint, or an empty one if there is none"""
+    if not os.path.exists(path):
+        return {"rows_done": 0, "output_bytes": 0, "input_bytes": 0}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_checkpoint(path: str, rows_done: int, output_bytes: int, input_bytes: int = 0):
+    """Atomically replace the checkpoint"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"rows_done": rows_done, "output_bytes": output_bytes, "input_bytes": input_bytes}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_chunks(
+    path: str, text_column: str, chunk_size: int, skip: int = 0, offset: int = 0
+) -> Iterator[Tuple[list, int]]:
+    """
+    Lazily yield chunks of (post_index, text) pairs from the input CSV, each
+    with the input byte offset just past its last row.
+
+    The first `skip` rows are skipped by seeking to `offset`, their end
+    offset from an earlier run, or by reading past them if it is unknown.
+    """
+    with open(path, "rb") as f:
+        # csv pulls only the lines of the rows it returns, so f.tell() stays
+        # at the end of the last row read
+        reader = csv.reader(line.decode("utf-8") for line in iter(f.readline, b""))
+        header = next(reader, None)
+        if header is None:
+            return
+        column = header.index(text_column)
+        if skip and offset:
+            f.seek(offset)
+        else:
+            for _ in islice(reader, skip):
+                pass
+        index = skip
+        while True:
+            chunk = []
+            for row in islice(reader, chunk_size):
+                index += 1
+                chunk.append((index, row[column] if column < len(row) else None))
+            if not chunk:
+                return
+            yield chunk, f.tell()
+
+
+def label_chunk(
+    chunk: list, pool: Pool = None, workers: int = 1, cache_stats: Dict[int, dict] = None
+) -> list:
+    """
+    Label a chunk, in order, in-process or on the worker pool.
+
+    If `cache_stats` is given, it is updated with the latest fingerprint
+    cache statistics of each process, by process ID.
+    """
+    if pool is None:
+        batches = [_label_batch(chunk)]
+    else:
+        # A few batches per worker keeps the load balanced
+        size = max(1, -(-len(chunk) // (workers * 4)))
+        batches = pool.map(_label_batch, [chunk[i:i + size] for i in range(0, len(chunk), size)])
+    results = []
+    for pid, rows, stats in batches:
+        results.extend(rows)
+        if cache_stats is not None:
+            cache_stats[pid] = stats
+    return results
+
+
+def run_backfill(
+    input_path: str,
+    output_path: str,
+    text_column: str = "text",
+    chunk_size: int = 1000,
+    workers: int = 0,
+    labeler_names: List[str] = ("panic",),
+    labeler_inputs_dir: str = "labeler-inputs",
+    checkpoint_path: str = None,
+    similarity: float = None,
+    force: bool = False,
+) -> int:
+    """
+    Label every post of `input_path` into `output_path`, resuming from the
+    checkpoint if one exists. If `similarity` is set, near-duplicate texts
+    reuse cached verdicts (see pylabel.fingerprint). An existing output file
+    without a checkpoint is only overwritten with `force`.
+
+    Returns:
+        int: Total number of rows labeled so far
+    """
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint.json"
+    if (not force and not os.path.exists(checkpoint_path)
+            and os.path.exists(output_path) and os.path.getsize(output_path) > 0):
+        raise FileExistsError(
+            f"{output_path} exists but has no checkpoint {checkpoint_path}; pass --force to overwrite it"
+        )
+    checkpoint = read_checkpoint(checkpoint_path)
+    rows_done = checkpoint["rows_done"] if os.path.exists(output_path) else 0
+
+    # Drop any rows written after the last checkpoint so they are not duplicated
+    output_exists = os.path.exists(output_path) and rows_done > 0
+    with open(output_path, "a+b") as f:
+        f.truncate(checkpoint["output_bytes"] if output_exists else 0)
+    if rows_done:
+        print(f"Resuming after {rows_done} rows")
+
+    # Latest fingerprint cache statistics of each labeling process
+    cache_stats = {}
+    pool = None
+    if workers > 0:
+        pool = Pool(workers, initializer=_init_labeler,
+                    initargs=(labeler_names, labeler_inputs_dir, similarity))
+    else:
+        _init_labeler(labeler_names, labeler_inputs_dir, similarity)
+
+    try:
+        with open(output_path, "a", newline="", encoding="utf-8") as out:
+            writer = csv.DictWriter(out, fieldnames=OUTPUT_FIELDS)
+            if not output_exists:
+                writer.writeheader()
+
+            input_bytes = checkpoint.get("input_bytes", 0) if output_exists else 0
+            chunks = read_chunks(input_path, text_column, chunk_size, skip=rows_done, offset=input_bytes)
+            for chunk, input_bytes in chunks:
+                results = label_chunk(chunk, pool, workers, cache_stats)
+                for index, text, labels in results:
+                    writer.writerow({"post_index": index, "text": text, "labels": json.dumps(labels)})
+                out.flush()
+                os.fsync(out.fileno())
+                rows_done += len(results)
+                write_checkpoint(checkpoint_path, rows_done, out.tell(), input_bytes)
+                print(f"Labeled {rows_done} rows")
+        for name, stats in merge_cache_stats(cache_stats).items():
+            print(f"{name} fingerprint cache: {stats}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return rows_done
+
+
+def main():
+    """
+    Main function for the backfill command
+    """
+    parser = argparse.ArgumentParser(description="Stream labels over a large CSV of posts")
+    parser.add_argument("input_csv", type=str)
+    parser.add_argument("output_csv", type=str)
+    parser.add_argument("--text_column", type=str, default="text")
+    parser.add_argument("--chunk_size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Number of worker processes (0 labels in-process)")
+    parser.add_argument("--labelers", type=str, default="panic",
+                        help="Comma-separated labelers to run: panic, automated")
+    parser.add_argument("--labeler_inputs_dir", type=str, default="labeler-inputs")
+    parser.add_argument("--checkpoint", type=str, default=None,
+                        help="Checkpoint file (default: <output_csv>.checkpoint.json)")
+    parser.add_argument("--force", action="store_true",
+                        help="Overwrite an existing output file that has no checkpoint")
+    parser.add_argument("--fingerprint_similarity", type=float, default=None,
+                        help="Reuse verdicts for near-duplicate texts at this similarity (e.g. 0.85); "
+                             "each worker process keeps its own cache")
+    args = parser.parse_args()
+
+    labeler_names = [name.strip() for name in args.labelers.split(",") if name.strip()]
+    unknown = set(labeler_names) - {"panic", "automated"}
+    if unknown:
+        print(f"Unknown labelers: {', '.join(sorted(unknown))}")
+        sys.exit(1)
+
+    try:
+        total = run_backfill(
+            args.input_csv,
+            args.output_csv,
+            text_column=args.text_column,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            labeler_names=labeler_names,
+            labeler_inputs_dir=args.labeler_inputs_dir,
+            checkpoint_path=args.checkpoint,
+            similarity=args.fingerprint_similarity,
+            force=args.force,
+        )
+    except FileExistsError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Backfill complete: {total} rows labeled into {args.output_csv}")
+
+
+if __name__ == "__main__":
+    main()
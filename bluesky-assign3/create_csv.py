@@ -1,3 +1,4 @@
+import argparse
 import os
 import csv
 import re
@@ -5,12 +6,21 @@ import time
 from dotenv import load_dotenv
 from atproto import Client
 
+from pylabel.crawl_state import CrawlState
+from pylabel.session import login_client
+
 load_dotenv()
 USERNAME = os.getenv("USERNAME")
 PASSWORD = os.getenv("PW")
 
-client = Client()
-client.login(USERNAME, PASSWORD)
+# Logged in on first use, so importing this module costs no network round-trip
+_client = None
+
+def get_client() -> Client:
+    global _client
+    if _client is None:
+        _client = login_client(USERNAME, PASSWORD)
+    return _client
 
 PANIC_KEYWORDS = [
     "threat", "emergency", "evacuate", "shelter", "crisis",
@@ -27,75 +37,161 @@ PANIC_PATTERNS = [
 ]
 PANIC_REGEX = re.compile("|".join(PANIC_PATTERNS), re.IGNORECASE)
 
-def search_and_collect_posts(keywords, max_posts=500, per_keyword_limit=50):
-    collected = []
+def _end_sweep(progress, caught_up):
+    """Update a keyword's crawl progress once its search stops"""
+    if not caught_up and progress["newest_seen"] is None and progress["sweep_newest"]:
+        # A cut-off first sweep would keep paging back through ever older
+        # posts on later runs; treat it as complete and watch for new ones
+        caught_up = True
+    if caught_up:
+        # Sweep complete: next run only needs posts newer than this one's newest
+        progress["newest_seen"] = max(filter(None, [progress["newest_seen"], progress["sweep_newest"]]),
+                                      default=None)
+        progress["cursor"] = None
+        progress["sweep_newest"] = None
+        progress["partial_page"] = False
+
+def iter_search_posts(keywords, max_posts=500, per_keyword_limit=50, client=None, seen_texts=None,
+                      state=None):
+    """
+    Lazily search for matching posts, yielding each one as soon as it is found.
+    Pass a shared `seen_texts` set to dedupe across concurrent searches.
+
+    With a CrawlState, each keyword resumes where the previous run stopped and
+    stops paging once it reaches posts that were already crawled, and post
+    URIs seen in earlier runs are skipped.
+    """
+    client = client or get_client()
+    collected_count = 0
     matched_count = 1
-    seen_texts = set()
-
-    for kw in keywords:
-        print(f"\nSearching for: '{kw}'")
-        cursor = None
-        keyword_post_count = 0
-
-        while keyword_post_count < per_keyword_limit and len(collected) < max_posts:
-            try:
-                res = client.app.bsky.feed.search_posts({
-                    "q": kw,
-                    "limit": 25,
-                    "cursor": cursor,
-                    "sort": "latest",
-                    "lang": "en"
-                })
-            except Exception as e:
-                print(f"Error while searching '{kw}': {e}")
-                break
-
-            for p in res.posts or []:
-                if keyword_post_count >= per_keyword_limit or len(collected) >= max_posts:
+    seen_texts = set() if seen_texts is None else seen_texts
+
+    try:
+        for kw in keywords:
+            print(f"\nSearching for: '{kw}'")
+            progress = state.keyword(kw) if state else None
+            cursor = progress["cursor"] if progress else None
+            if progress and cursor is None:
+                progress["sweep_newest"] = None
+            # Only a page an earlier run stopped partway through can repeat posts
+            check_seen = bool(progress and progress.get("partial_page"))
+            keyword_post_count = 0
+            caught_up = False
+
+            while keyword_post_count < per_keyword_limit and collected_count < max_posts:
+                try:
+                    res = client.app.bsky.feed.search_posts({
+                        "q": kw,
+                        "limit": 25,
+                        "cursor": cursor,
+                        "sort": "latest",
+                        "lang": "en"
+                    })
+                except Exception as e:
+                    print(f"Error while searching '{kw}': {e}")
                     break
 
-                rec = getattr(p, "record", None)
-                if not rec or not hasattr(rec, "text"):
-                    continue
-
-                # unsure only unique posts
-                text = rec.text.strip()
-                if text in seen_texts:
-                    continue
-                seen_texts.add(text)
-                if kw.lower() not in text.lower():
-                    continue
-                if not PANIC_REGEX.search(text):
-                    continue
-
-                print(f"{matched_count}. Matched post: {text[:80]}...")
-                matched_count += 1
-
-                collected.append({
-                    "text": text,
-                    "keyword": kw,
-                    "creator": p.author.handle,
-                    "rkey": p.uri.split("/")[-1],
-                    "likes": getattr(p, "like_count", 0),
-                    "reposts": getattr(p, "repost_count", 0),
-                    "responses": getattr(p, "reply_count", 0),
-                })
-
-                keyword_post_count += 1
+                page_done = True
+                for p in res.posts or []:
+                    if keyword_post_count >= per_keyword_limit or collected_count >= max_posts:
+                        page_done = False
+                        break
+
+                    if progress:
+                        indexed_at = getattr(p, "indexed_at", None)
+                        # Everything from here on was crawled by an earlier sweep
+                        if indexed_at and progress["newest_seen"] and indexed_at <= progress["newest_seen"]:
+                            caught_up = True
+                            break
+                        if indexed_at and (progress["sweep_newest"] is None or indexed_at > progress["sweep_newest"]):
+                            progress["sweep_newest"] = indexed_at
+                        if check_seen and state.is_seen(p.uri):
+                            continue
+                        state.mark_seen(p.uri)
+
+                    rec = getattr(p, "record", None)
+                    if not rec or not hasattr(rec, "text"):
+                        continue
+
+                    # unsure only unique posts
+                    text = rec.text.strip()
+                    if text in seen_texts:
+                        continue
+                    seen_texts.add(text)
+                    if kw.lower() not in text.lower():
+                        continue
+                    if not PANIC_REGEX.search(text):
+                        continue
+
+                    print(f"{matched_count}. Matched post: {text[:80]}...")
+                    matched_count += 1
+
+                    collected_count += 1
+                    try:
+                        yield {
+                            "text": text,
+                            "keyword": kw,
+                            "creator": p.author.handle,
+                            "rkey": p.uri.split("/")[-1],
+                            "uri": p.uri,
+                            "cid": p.cid,
+                            "likes": getattr(p, "like_count", 0),
+                            "reposts": getattr(p, "repost_count", 0),
+                            "responses": getattr(p, "reply_count", 0),
+                        }
+                    except GeneratorExit:
+                        # The consumer stopped the search (close()) partway through this page
+                        if progress:
+                            progress["partial_page"] = True
+                            _end_sweep(progress, caught_up=False)
+                        raise
+
+                    keyword_post_count += 1
+
+                if progress:
+                    progress["partial_page"] = not page_done
+                if not page_done:
+                    # Resume from this page next time; seen URIs are skipped
+                    break
+                check_seen = False
+                cursor = getattr(res, "cursor", None)
+                if caught_up or not cursor:
+                    caught_up = True
+                    break
+                if progress:
+                    progress["cursor"] = cursor
 
-            cursor = getattr(res, "cursor", None)
-            if not cursor:
-                break
+                time.sleep(1)
 
-            time.sleep(1)
+            if progress:
+                _end_sweep(progress, caught_up)
+            if state:
+                state.save()
+    finally:
+        if state:
+            state.save()
 
-    return collected
+def search_and_collect_posts(keywords, max_posts=500, per_keyword_limit=50, client=None, state=None):
+    return list(iter_search_posts(keywords, max_posts, per_keyword_limit, client, state=state))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect panic-language posts into a CSV")
+    parser.add_argument("--crawl_state", type=str, default=None,
+                        help="JSON file of crawl progress; only posts newer than the last run are "
+                             "collected and appended to the CSV")
+    args = parser.parse_args()
+
     output_path = "./bluesky-assign3/test-data/input-posts-panic.csv"
-    posts = search_and_collect_posts(PANIC_KEYWORDS, max_posts=100, per_keyword_limit=10)
-    with open(output_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["text", "keyword", "creator", "likes", "reposts", "responses"])
-        writer.writeheader()
-        writer.writerows(posts)
-    print(f"\nSaved {len(posts)} posts to {output_path}")
\ No newline at end of file
+    state = CrawlState(args.crawl_state) if args.crawl_state else None
+    append = state is not None and os.path.exists(output_path)
+    saved = 0
+    with open(output_path, "a" if append else "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["text", "keyword", "creator", "likes", "reposts", "responses"],
+                                extrasaction="ignore")
+        if not append:
+            writer.writeheader()
+        # Write each post as it is found instead of holding them all in memory
+        for post in iter_search_posts(PANIC_KEYWORDS, max_posts=100, per_keyword_limit=10, state=state):
+            writer.writerow(post)
+            saved += 1
+    print(f"\nSaved {saved} posts to {output_path}")
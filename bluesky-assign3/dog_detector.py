@@ -7,12 +7,15 @@ if they match within a specified threshold.
 """
 
 import os
+import threading
 from typing import List, Optional
 import requests
 from io import BytesIO
 from PIL import Image
 from perception import hashers
 
+from sampled_profiler import SampledProfiler, default_profiler, profiled
+
 # Default threshold
 THRESH = 0.3
 
@@ -21,7 +24,8 @@ class DogImageDetector:
     A class for detecting dog images using perceptual hashing.
     """
     
-    def __init__(self, dog_images_dir: str, hash_size: int = 16, threshold: float = THRESH):
+    def __init__(self, dog_images_dir: str, hash_size: int = 16, threshold: float = THRESH,
+                 profiler: Optional[SampledProfiler] = None):
         """
         Initialize the dog image detector.
         
@@ -29,15 +33,21 @@ class DogImageDetector:
             dog_images_dir: Directory containing reference dog images
             hash_size: Size of the perceptual hash (default: 16)
             threshold: Maximum normalized Hamming distance for a match (default: THRESH)
+            profiler: Sampled profiler for downloads and hashing (default: the
+                one enabled by PROFILE_EVERY, if any)
         """
         self.hash_size = hash_size
         self.threshold = threshold
+        self.profiler = profiler or default_profiler()
         
         # Initialize the PHash hasher from Perception library
         self.hasher = hashers.PHash(hash_size=self.hash_size)
         
         # Build the database of dog image hashes
         self.dog_hashes = self._build_hash_database(dog_images_dir)
+        
+        # Total bytes of images downloaded, to compare image sources
+        self.bytes_downloaded = 0
 
     def _build_hash_database(self, images_dir: str) -> List[str]:
         """
@@ -83,6 +93,7 @@ class DogImageDetector:
             
             # Check if the request was successful
             if response.status_code == 200:
+                self.bytes_downloaded += len(response.content)
                 return Image.open(BytesIO(response.content))
             return None
                 
@@ -129,9 +140,25 @@ class DogImageDetector:
         
         return False
     
-    def is_dog_image_url(self, url: str) -> bool:
+    def is_dog_image_url(self, url: str, fallback_urls: List[str] = (),
+                         cancelled: Optional[threading.Event] = None) -> bool:
         """
         Check if an image at a URL matches any of the reference dog images.
+        
+        Args:
+            url: URL of the image
+            fallback_urls: URLs of the same image to try, in order, if the
+                download from `url` fails (e.g. the original for a thumbnail)
+            cancelled: If set while downloading (e.g. another image of the
+                post already matched), skip the remaining work
         """
-        image = self.download_image(url)
-        return self.is_dog_image(image)
+        with profiled(self.profiler, "DogImageDetector.download_image"):
+            image = self.download_image(url)
+            for fallback_url in fallback_urls:
+                if image is not None or (cancelled is not None and cancelled.is_set()):
+                    break
+                image = self.download_image(fallback_url)
+        if cancelled is not None and cancelled.is_set():
+            return False
+        with profiled(self.profiler, "DogImageDetector.is_dog_image"):
+            return self.is_dog_image(image)
@@ -5,10 +5,10 @@ This module integrates the dog image detector and image extractor
 with the Bluesky labeler framework to label posts containing dog images.
 """
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from atproto import Client
 from dog_detector import DogImageDetector
-from image_extractor import ImageExtractor
+from image_extractor import BLOB_SOURCE, ImageExtractor
 from pylabel.label import post_from_url
 
 class DogLabeler:
@@ -19,19 +19,20 @@ class DogLabeler:
     and applies the "dog" label when a match is found.
     """
     
-    def __init__(self, dog_images_dir: str, client: Client = None):
+    def __init__(self, dog_images_dir: str, client: Client = None, image_source: str = BLOB_SOURCE):
         """
         Initialize the dog labeler.
         
         Args:
             dog_images_dir: Directory containing reference dog images
             client: Client to use for API requests (optional)
+            image_source: Fetch full-size blobs or CDN thumbnails (see image_extractor)
         """
         # Initialize the dog image detector
         self.detector = DogImageDetector(dog_images_dir)
         
         # Initialize the image extractor
-        self.extractor = ImageExtractor()
+        self.extractor = ImageExtractor(image_source)
         
         # Store the client
         self.client = client or Client()
@@ -53,11 +54,27 @@ class DogLabeler:
         
         # Check each image for dog matches
         for url in image_urls:
-            if self.detector.is_dog_image_url(url):
+            if self.detector.is_dog_image_url(url, self.extractor.fallback_urls(url)):
                 return True
         
         return False
     
+    def moderate_view(self, view) -> List[str]:
+        """
+        Moderate a preprocessed post view (see pylabel.post_view).
+        
+        Args:
+            view: Shared view of the post
+            
+        Returns:
+            ["dog"] if the post contains a dog image, [] otherwise
+        """
+        for url in view.image_urls:
+            if self.detector.is_dog_image_url(url, self.extractor.fallback_urls(url)):
+                return ["dog"]
+        
+        return []
+    
     def moderate_post(self, url: str) -> Optional[str]:
         """
         Moderate a post and return a label if it contains a dog image.
@@ -2,10 +2,9 @@
 
 import os
 
-from atproto import Client
 from dotenv import load_dotenv
 
-from pylabel import post_from_url
+from pylabel import login_client, post_from_url
 
 load_dotenv(override=True)
 USERNAME = os.getenv("USERNAME", "jaanvi-ts.bsky.social")
@@ -14,8 +13,7 @@ PW = os.getenv("PW", "ChimkenNugget$25")
 
 def main():
     """Main function"""
-    client = Client()
-    client.login(USERNAME, PW)
+    client = login_client(USERNAME, PW)
     result = post_from_url(
         client, "https://bsky.app/profile/labeler-test.bsky.social/post/3lksxxugg4k27"
     )
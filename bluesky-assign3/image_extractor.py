@@ -4,28 +4,61 @@ Bluesky Image Extractor Module
 This module provides functionality to extract image URLs from Bluesky posts.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+# Full-size originals, served by the PDS
+BLOB_SOURCE = "blob"
+# Resized JPEG thumbnails, served by the Bluesky CDN
+THUMBNAIL_SOURCE = "thumbnail"
+
+BLOB_URL = "https://bsky.social/xrpc/com.atproto.sync.getBlob?did={did}&cid={cid}"
+THUMBNAIL_URL = "https://cdn.bsky.app/img/feed_thumbnail/plain/{did}/{cid}@jpeg"
+THUMBNAIL_PREFIX = "https://cdn.bsky.app/img/feed_thumbnail/plain/"
 
 class ImageExtractor:
     """
     A class for extracting image URLs from Bluesky posts.
     """
     
+    def __init__(self, source: str = BLOB_SOURCE):
+        """
+        Initialize the image extractor.
+        
+        Args:
+            source: BLOB_SOURCE to fetch full-size originals, or
+                THUMBNAIL_SOURCE to fetch the much smaller CDN thumbnails
+                (with the original as a fallback)
+        """
+        if source not in (BLOB_SOURCE, THUMBNAIL_SOURCE):
+            raise ValueError(f"Unknown image source: {source}")
+        self.source = source
+    
     @staticmethod
-    def extract_image_urls(post_data: Dict[str, Any]) -> List[str]:
+    def author_did(post_data: Dict[str, Any]) -> Optional[str]:
         """
-        Extract image URLs from a Bluesky post.
+        Get the DID of a post's author from its at:// URI.
+        """
+        uri = getattr(post_data, 'uri', None) or ""
+        parts = uri.split("/")
+        if len(parts) > 2 and parts[2].startswith("did:"):
+            return parts[2]
+        return None
+    
+    @staticmethod
+    def extract_image_cids(post_data: Dict[str, Any]) -> List[str]:
+        """
+        Extract the blob CIDs of the images embedded in a Bluesky post.
         
         Args:
             post_data: Dictionary containing post data
             
         Returns:
-            List of image URLs found in the post
+            List of image CIDs found in the post
         """
         if not post_data:
             return []
         
-        image_urls = []
+        image_cids = []
         
         try:
             # Handle response from client.get_post()
@@ -44,25 +77,73 @@ class ImageExtractor:
                             if hasattr(img, 'image') and img.image and hasattr(img.image, 'ref'):
                                 ref = img.image.ref
                                 if hasattr(ref, 'link'):
-                                    # Construct URL from the reference
-                                    link = ref.link
-                                    url = f"https://bsky.social/xrpc/com.atproto.sync.getBlob?did=did:plc:swmumnkmw5osopckigoal7ox&cid={link}"
-                                    image_urls.append(url)
+                                    image_cids.append(ref.link)
             
             # Try extracting from raw data if no images found
-            if not image_urls and hasattr(post_data, 'value') and hasattr(post_data.value, 'to_dict'):
-                raw_data = post_data.value.to_dict()
-                
-                # Look for image references in the raw data
-                if 'embed' in raw_data and 'images' in raw_data['embed']:
-                    for img in raw_data['embed']['images']:
-                        if 'image' in img and 'ref' in img['image']:
-                            link = img['image']['ref'].get('$link')
-                            if link:
-                                url = f"https://bsky.social/xrpc/com.atproto.sync.getBlob?did=did:plc:swmumnkmw5osopckigoal7ox&cid={link}"
-                                image_urls.append(url)
+            if not image_cids and hasattr(post_data, 'value') and hasattr(post_data.value, 'to_dict'):
+                image_cids = ImageExtractor.extract_raw_image_cids(post_data.value.to_dict())
                     
         except Exception:
             pass
         
-        return image_urls
+        return image_cids
+
+    @staticmethod
+    def extract_raw_image_cids(raw_data: Dict[str, Any]) -> List[str]:
+        """
+        Extract the blob CIDs of the images embedded in a raw post record.
+        
+        Args:
+            raw_data: Post record as a JSON dictionary
+            
+        Returns:
+            List of image CIDs found in the record
+        """
+        image_cids = []
+        
+        # Look for image references in the raw data
+        embed = raw_data.get('embed') or {}
+        for img in embed.get('images') or []:
+            if 'image' in img and 'ref' in img['image']:
+                link = img['image']['ref'].get('$link')
+                if link:
+                    image_cids.append(link)
+        
+        return image_cids
+
+    def image_url(self, cid: str, did: str) -> str:
+        """
+        Build the URL from which the image with the given CID, uploaded by
+        the account with the given DID, is fetched.
+        """
+        if self.source == THUMBNAIL_SOURCE:
+            return THUMBNAIL_URL.format(did=did, cid=cid)
+        return BLOB_URL.format(did=did, cid=cid)
+    
+    @staticmethod
+    def fallback_urls(url: str) -> List[str]:
+        """
+        URLs to try if fetching the given image URL fails (the full-size
+        blob for a CDN thumbnail, nothing otherwise).
+        """
+        if not url.startswith(THUMBNAIL_PREFIX):
+            return []
+        did, _, cid = url[len(THUMBNAIL_PREFIX):].partition("/")
+        cid = cid.split("@")[0]
+        return [BLOB_URL.format(did=did, cid=cid)]
+    
+    def extract_image_urls(self, post_data: Dict[str, Any]) -> List[str]:
+        """
+        Extract image URLs from a Bluesky post.
+        
+        Args:
+            post_data: Dictionary containing post data
+            
+        Returns:
+            List of image URLs found in the post (empty if the author's DID
+            cannot be determined, as blobs are only served per account)
+        """
+        did = self.author_did(post_data)
+        if did is None:
+            return []
+        return [self.image_url(cid, did) for cid in self.extract_image_cids(post_data)]
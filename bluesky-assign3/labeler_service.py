@@ -0,0 +1,280 @@
+"""
+Long-running labeler service.
+
+Loads the labelers once (word/domain lists, news domains, dog image hashes)
+and serves labeling requests over local HTTP, so short-lived callers do not
+pay the startup cost on every run.
+
+Endpoints:
+    POST /label    {"url": ...} | {"urls": [...]} | {"record": {...}, "uri": ...}
+                   | {"records": [{"record": {...}, "uri": ...}, ...]}
+                   | {"text": ...} | {"texts": [...]}
+                   (raw records need their at:// "uri" for images to be checked)
+    GET  /health   liveness check
+    GET  /metrics  request counts, label counts and latency percentiles
+
+Example:
+    python labeler_service.py labeler-inputs --port 8080
+    curl -s localhost:8080/label -d '{"texts": ["EMERGENCY!!! evacuate now"]}'
+"""
+
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+from image_extractor import BLOB_SOURCE, THUMBNAIL_SOURCE
+from policy_proposal_labeler import PanicLanguageLabeler
+from pylabel.automated_labeler import AutomatedLabeler
+from pylabel.fingerprint import FingerprintCache
+from pylabel.multi_labeler import CompositeLabeler
+from pylabel.session import login_client
+
+load_dotenv(override=True)
+USERNAME = os.getenv("USERNAME")
+PW = os.getenv("PW")
+
+# Number of recent request latencies kept for percentiles
+LATENCY_WINDOW = 1000
+# Seconds an idle keep-alive connection is held open
+IDLE_TIMEOUT = 5.0
+
+
+class ServiceMetrics:
+    """Thread-safe request counters and recent latencies"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.posts = 0
+        self.labels = Counter()
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, results, latency_ms: float, error: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.posts += len(results)
+            for result in results:
+                self.labels.update(result.get("labels", []))
+            self.latencies_ms.append(latency_ms)
+
+    def snapshot(self, labeler: CompositeLabeler) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+            snapshot = {
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "requests": self.requests,
+                "errors": self.errors,
+                "posts": self.posts,
+                "labels": dict(self.labels),
+            }
+        if latencies:
+            snapshot["latency_ms"] = {
+                "p50": round(latencies[len(latencies) // 2], 3),
+                "p95": round(latencies[int(len(latencies) * 0.95)], 3),
+                "max": round(latencies[-1], 3),
+            }
+        caches = {
+            type(member).__name__: member.fingerprint_cache.stats()
+            for member in labeler.labelers
+            if getattr(member, "fingerprint_cache", None) is not None
+        }
+        if caches:
+            snapshot["fingerprint_caches"] = caches
+        return snapshot
+
+
+class LabelerService:
+    """Labels posts, records or texts with a resident CompositeLabeler"""
+
+    def __init__(self, labeler: CompositeLabeler, max_workers: int = 8):
+        self.labeler = labeler
+        self.metrics = ServiceMetrics()
+        # Set on shutdown so keep-alive connections are closed after their reply
+        self.stopping = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _timed(self, kind: str, value, fn) -> dict:
+        start = time.perf_counter()
+        labels = fn()
+        return {
+            kind: value,
+            "labels": labels,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def _label_url(self, url: str) -> dict:
+        if self.labeler.client is None:
+            raise ValueError("service was started with --offline; post URLs are not supported")
+        return self._timed("url", url, lambda: self.labeler.moderate_post(url))
+
+    def _label_record(self, item: dict) -> dict:
+        record = item.get("record", item)
+        uri = item.get("uri")
+        if not isinstance(record, dict) or not isinstance(uri, (str, type(None))):
+            raise ValueError("each record must be a JSON object with an optional string uri")
+        if not isinstance(record.get("text", ""), (str, type(None))):
+            raise ValueError("a record's text must be a string")
+        return self._timed("uri", uri, lambda: self.labeler.moderate_record(record, uri))
+
+    def _label_text(self, text: str) -> dict:
+        return self._timed("text", text, lambda: self.labeler.moderate_text(text))
+
+    def label(self, request: dict) -> list:
+        """
+        Label every item of a request, fetching posts concurrently.
+
+        Raises:
+            ValueError: If the request is not shaped as documented above
+        """
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        urls = request.get("urls") or ([request["url"]] if "url" in request else [])
+        records = request.get("records") or ([request] if "record" in request else [])
+        texts = request.get("texts") or ([request["text"]] if "text" in request else [])
+        if not (urls or records or texts):
+            raise ValueError("request must contain url(s), record(s) or text(s)")
+        for name, items, kind in (("urls", urls, str), ("records", records, dict), ("texts", texts, str)):
+            if not isinstance(items, list) or not all(isinstance(item, kind) for item in items):
+                raise ValueError(f"{name} must be a list of {'objects' if kind is dict else 'strings'}")
+
+        results = list(self._executor.map(self._label_url, urls))
+        results.extend(self._label_record(item) for item in records)
+        results.extend(self._label_text(text) for text in texts)
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def make_handler(service: LabelerService, idle_timeout: float = IDLE_TIMEOUT):
+    """Build the HTTP request handler class bound to a service"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Idle keep-alive connections are dropped after this many seconds, so
+        # shutdown does not wait on clients that never close
+        timeout = idle_timeout
+
+        def _send_json(self, status: int, body: dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            if service.stopping.is_set():
+                self.send_header("Connection", "close")
+                self.close_connection = True
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif self.path == "/metrics":
+                self._send_json(200, service.metrics.snapshot(service.labeler))
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/label":
+                self._send_json(404, {"error": "not found"})
+                return
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                results = service.label(request)
+            except (ValueError, KeyError, TypeError) as e:
+                service.metrics.record([], (time.perf_counter() - start) * 1000, error=True)
+                self._send_json(400, {"error": str(e)})
+                return
+            except Exception as e:
+                service.metrics.record([], (time.perf_counter() - start) * 1000, error=True)
+                print(f"[ERROR] Failed to label request: {e}")
+                self._send_json(500, {"error": "internal error"})
+                return
+            latency_ms = (time.perf_counter() - start) * 1000
+            service.metrics.record(results, latency_ms)
+            self._send_json(200, {"results": results, "latency_ms": round(latency_ms, 3)})
+
+        def log_message(self, format, *args):
+            # Per-request access logs are too noisy for a busy service
+            pass
+
+    return Handler
+
+
+def main():
+    """
+    Main function for the labeler service
+    """
+    parser = argparse.ArgumentParser(description="Serve labeling requests over local HTTP")
+    parser.add_argument("labeler_inputs_dir", type=str)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Maximum posts fetched concurrently per batch")
+    parser.add_argument("--idle_timeout", type=float, default=IDLE_TIMEOUT,
+                        help="Seconds before an idle keep-alive connection is closed")
+    parser.add_argument("--image_source", type=str, default=BLOB_SOURCE, choices=[BLOB_SOURCE, THUMBNAIL_SOURCE],
+                        help="Hash full-size blobs or CDN thumbnails")
+    parser.add_argument("--fingerprint_similarity", type=float, default=None,
+                        help="Reuse verdicts for near-duplicate texts at this similarity (e.g. 0.85); "
+                             "hit rates are reported under /metrics")
+    parser.add_argument("--offline", action="store_true",
+                        help="Do not log in; only raw records and texts can be labeled")
+    args = parser.parse_args()
+
+    client = None if args.offline else login_client(USERNAME, PW)
+    start = time.perf_counter()
+
+    def cache():
+        return FingerprintCache(similarity=args.fingerprint_similarity) if args.fingerprint_similarity else None
+
+    labeler = CompositeLabeler(client, [
+        AutomatedLabeler(client, args.labeler_inputs_dir, image_source=args.image_source,
+                         fingerprint_cache=cache()),
+        PanicLanguageLabeler(fingerprint_cache=cache()),
+    ], image_source=args.image_source)
+    print(f"Labelers loaded in {time.perf_counter() - start:.2f} seconds")
+
+    service = LabelerService(labeler, max_workers=args.workers)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service, args.idle_timeout))
+    # Let in-flight requests finish on shutdown
+    server.daemon_threads = False
+    server.block_on_close = True
+
+    def stop(signum, _frame):
+        print(f"Received signal {signum}, shutting down")
+        service.stopping.set()
+        # shutdown() blocks until serve_forever returns, so call it off-thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.shutdown()
+        for member in labeler.labelers:
+            engine = getattr(member, "rule_engine", None)
+            if engine is not None:
+                engine.shutdown()
+        print("Labeler service stopped")
+
+
+if __name__ == "__main__":
+    main()
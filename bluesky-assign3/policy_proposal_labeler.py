@@ -1,11 +1,18 @@
 """Policy Proposal Labeler: Likely Panic Language Detector"""
 
 import re
-import time
-import sys
-from typing import Optional
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from ruleset import ruleset_version
+from sampled_profiler import SampledProfiler, default_profiler, profiled
+
+if TYPE_CHECKING:
+    # Importing pylabel pulls in pandas/atproto; the panic labeler needs neither
+    from pylabel.fingerprint import FingerprintCache
 
 PANIC_LABEL = "likely-panic-language"
+# Bump whenever the scoring logic changes, so stored results are recomputed
+RULES_VERSION = 1
 
 # Define trigger words, emojis, and punctuation patterns
 PANIC_KEYWORDS = [
@@ -19,51 +26,84 @@ PANIC_EMOJIS = ["🚨", "⚠️", "‼️", "❗", "❕"]
 class PanicLanguageLabeler:
     """Detects emotionally manipulative or panic-inducing language."""
 
-    def __init__(self, keyword_threshold: int = 2):
+    def __init__(self, keyword_threshold: int = 2, fingerprint_cache: Optional["FingerprintCache"] = None,
+                 profiler: Optional[SampledProfiler] = None):
         self.keyword_threshold = keyword_threshold
+        # Reuses verdicts for near-duplicate copies of already scored posts
+        self.fingerprint_cache = fingerprint_cache
+        # Times posts and samples them under cProfile/tracemalloc (PROFILE_EVERY)
+        self.profiler = profiler or default_profiler()
+        self.ruleset_version = ruleset_version(
+            RULES_VERSION, PANIC_LABEL, PANIC_KEYWORDS, PANIC_EMOJIS, keyword_threshold
+        )
+
+    @staticmethod
+    def _style_signals(text: str) -> Tuple[bool, bool, bool]:
+        """Signals that word tokens do not capture: emojis, all-caps words, punctuation."""
+        # Emoji presence
+        has_emoji = any(emoji in text for emoji in PANIC_EMOJIS)
+
+        # All-caps words (excluding short acronyms)
+        has_caps = any(w.isupper() and len(w) > 3 for w in text.split())
+
+        # Excessive punctuation
+        has_punctuation = "!!!" in text or "???" in text
+
+        return has_emoji, has_caps, has_punctuation
 
-    def _count_panic_signals(self, text: str) -> int:
+    def _count_panic_signals(self, text: str, lowered: Optional[str] = None,
+                             style: Optional[Tuple[bool, bool, bool]] = None) -> int:
         score = 0
-        lowered = text.lower()
+        if lowered is None:
+            lowered = text.lower()
 
         # Count keyword matches
         for word in PANIC_KEYWORDS:
             if word in lowered:
                 score += 1
 
-        # Count emoji presence
-        if any(emoji in text for emoji in PANIC_EMOJIS):
-            score += 1
-
-        # All-caps words (excluding short acronyms)
-        all_caps_words = [w for w in text.split() if w.isupper() and len(w) > 3]
-        if len(all_caps_words) >= 1:
-            score += 1
-
-        # Excessive punctuation
-        if "!!!" in text or "???" in text:
-            score += 1
+        if style is None:
+            style = self._style_signals(text)
+        score += sum(style)
 
         return score
 
+    def _score(self, text: str, lowered: str, tokens: Optional[List[str]] = None) -> Tuple[List[str], int]:
+        """Scores the text, reusing the verdict of a near-duplicate if cached."""
+        fingerprint = style = None
+        if self.fingerprint_cache is not None:
+            from pylabel.fingerprint import MIN_FINGERPRINT_TOKENS, TOKEN_PATTERN, simhash
+
+            if tokens is None:
+                tokens = TOKEN_PATTERN.findall(text.casefold())
+            if len(tokens) >= MIN_FINGERPRINT_TOKENS:
+                fingerprint = simhash(tokens)
+                # Tokens drop emojis, case and punctuation, so near-duplicates
+                # only share a verdict if those signals agree too
+                style = self._style_signals(text)
+                cached = self.fingerprint_cache.lookup(fingerprint, namespace=style)
+                if cached is not None:
+                    return cached.labels, cached.evidence["score"]
+
+        score = self._count_panic_signals(text, lowered, style)
+        labels = [PANIC_LABEL] if score >= self.keyword_threshold else []
+        if fingerprint is not None:
+            self.fingerprint_cache.store(fingerprint, labels, evidence={"score": score}, namespace=style)
+        return labels, score
+
     def moderate_post(self, text: str) -> Optional[str]:
         """Returns a label if panic signals exceed threshold."""
-
-        start_time = time.perf_counter()
-
         if not text:
-            end_time = time.perf_counter()
-            print(f"[DEBUG] Time to label post: {end_time - start_time:.6f} seconds")
             return None
 
-        score = self._count_panic_signals(text)
-        print(f"[DEBUG] Panic score memory: {sys.getsizeof(score)} bytes")
-
-        if score >= self.keyword_threshold:
-            end_time = time.perf_counter()
-            print(f"[DEBUG] Time to label post: {end_time - start_time:.6f} seconds")
-            return PANIC_LABEL
-        
-        end_time = time.perf_counter()
-        print(f"[DEBUG] Time to label post: {end_time - start_time:.6f} seconds")
-        return None
+        with profiled(self.profiler, "PanicLanguageLabeler.moderate_post"):
+            labels, _ = self._score(text, text.lower())
+        return labels[0] if labels else None
+
+    def moderate_view(self, view) -> List[str]:
+        """Labels a preprocessed post view (see pylabel.post_view)."""
+        if not view.text:
+            return []
+        with profiled(self.profiler, "PanicLanguageLabeler.moderate_view"):
+            labels, _ = self._score(view.text, view.lowered, view.tokens)
+        return labels
@@ -1,3 +1,13 @@
 """Init file for module"""
 from .automated_labeler import *
 from .label import *
+from .result_store import *
+from .rule_engine import *
+from .post_view import *
+from .multi_labeler import *
+from .link_extractor import *
+from .fingerprint import *
+from .session import *
+from .account_aggregator import *
+from .label_diff import *
+from .crawl_state import *
@@ -0,0 +1,173 @@
+"""Per-author label history used to escalate post labels to account labels"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Post labels that count towards an account label by default
+ESCALATED_LABELS = ("likely-panic-language", "t-and-s")
+
+
+class AccountAggregator:
+    """
+    Fixed-size table of exponentially decayed per-author label counts.
+
+    Each (author, label) pair holds a score that is incremented for every
+    labeled post and halves every `half_life` seconds, so it approximates
+    the number of such posts in a sliding window. When the table is full
+    the least recently updated pair is evicted, so memory stays bounded
+    however many authors are seen. A pair whose score reaches `threshold`
+    is escalated once through `on_escalate(author, label)`; if that fails,
+    the next post of the pair retries it.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 5.0,
+        half_life: float = 24 * 3600,
+        max_entries: int = 100000,
+        labels: Iterable[str] = ESCALATED_LABELS,
+        on_escalate: Optional[Callable[[str, str], None]] = None,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_every: int = 100,
+        checkpoint_interval: float = 30.0,
+    ):
+        """
+        Initialize the aggregator, restoring its checkpoint if one exists.
+
+        Args:
+            threshold: Decayed post count at which an account is escalated
+            half_life: Seconds for a post's contribution to halve
+            max_entries: Maximum (author, label) pairs kept in memory
+            labels: Post labels that are tracked
+            on_escalate: Called with (author, label) when the threshold is crossed
+            checkpoint_path: JSON file the table is saved to and restored from
+            checkpoint_every: Save after this many observed labels
+            checkpoint_interval: Minimum seconds between automatic saves
+        """
+        self.threshold = threshold
+        self.half_life = half_life
+        self.max_entries = max_entries
+        self.labels = set(labels)
+        self.on_escalate = on_escalate
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.evictions = 0
+        # (author, label) -> [score, updated_at, escalated]
+        self._entries: "OrderedDict[tuple, list]" = OrderedDict()
+        # Pairs whose on_escalate call is in progress
+        self._escalating = set()
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self.load(checkpoint_path)
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** (max(0.0, now - updated_at) / self.half_life)
+
+    def score(self, author: str, label: str, now: Optional[float] = None) -> float:
+        """Current decayed count of `label` posts by `author`"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get((author, label))
+            return self._decayed(entry[0], entry[1], now) if entry else 0.0
+
+    def observe(self, author: str, labels: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """
+        Count one post by `author` with the given labels.
+
+        Returns:
+            List[str]: Labels for which the author was escalated by this post
+        """
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            for label in labels:
+                if label not in self.labels:
+                    continue
+                key = (author, label)
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = [0.0, now, False]
+                entry[0] = self._decayed(entry[0], entry[1], now) + 1.0
+                entry[1] = now
+                self._entries.move_to_end(key)
+                if entry[0] >= self.threshold and not entry[2] and key not in self._escalating:
+                    self._escalating.add(key)
+                    due.append(label)
+                self._since_checkpoint += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            save = (
+                self.checkpoint_path
+                and self._since_checkpoint >= self.checkpoint_every
+                and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+            )
+
+        # Escalate before any checkpoint I/O, and only flag pairs that succeeded
+        escalated = []
+        for label in due:
+            try:
+                if self.on_escalate is not None:
+                    self.on_escalate(author, label)
+                escalated.append(label)
+            except Exception as e:
+                print(f"[ERROR] Failed to escalate {author} for {label}, will retry: {e}")
+            with self._lock:
+                self._escalating.discard((author, label))
+                entry = self._entries.get((author, label))
+                if entry is not None and label in escalated:
+                    entry[2] = True
+
+        if save and self._save_lock.acquire(blocking=False):
+            # Another thread writing a checkpoint already covers this one
+            try:
+                self._write(self.checkpoint_path)
+            except OSError as e:
+                print(f"[ERROR] Failed to checkpoint account counts: {e}")
+            finally:
+                self._save_lock.release()
+        return escalated
+
+    def save(self, path: Optional[str] = None):
+        """Atomically write the table to a JSON checkpoint"""
+        with self._save_lock:
+            self._write(path or self.checkpoint_path)
+
+    def _write(self, path: str):
+        with self._lock:
+            entries = [[author, label, *entry] for (author, label), entry in self._entries.items()]
+            self._since_checkpoint = 0
+            self._last_checkpoint = time.monotonic()
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"half_life": self.half_life, "entries": entries}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        """Replace the table with the contents of a JSON checkpoint"""
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        with self._lock:
+            self._entries.clear()
+            # Entries were saved least recently updated first
+            for author, label, score, updated_at, escalated in state["entries"][-self.max_entries:]:
+                self._entries[(author, label)] = [score, updated_at, escalated]
+
+    def stats(self) -> Dict[str, int]:
+        """Table size, evictions and number of escalated pairs"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "escalated": sum(1 for entry in self._entries.values() if entry[2]),
+            }
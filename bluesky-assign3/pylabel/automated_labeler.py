@@ -2,25 +2,39 @@
 
 import os
 import re
-import urllib.parse
+import threading
 import pandas as pd
 from typing import List
 from atproto import Client
 
 from dog_detector import DogImageDetector
-from image_extractor import ImageExtractor
+from image_extractor import BLOB_SOURCE, ImageExtractor
+from ruleset import ruleset_version
+from sampled_profiler import SampledProfiler, default_profiler, profiled
+from pylabel.fingerprint import MIN_FINGERPRINT_TOKENS, FingerprintCache, simhash
 from pylabel.label import post_from_url
+from pylabel.link_extractor import Link, parse_link
+from pylabel.post_view import PostView, build_post_view, extract_text_urls, url_domain
+from pylabel.rule_engine import Rule, RuleEngine
 
 T_AND_S_LABEL = "t-and-s"
 DOG_LABEL = "dog"
 THRESH = 0.3
+# Bump whenever the rule logic changes, so results stored under the old
+# rules are recomputed rather than reused
+RULES_VERSION = 3
 
 class AutomatedLabeler:
     """Automated labeler implementation"""
 
-    def __init__(self, client: Client, input_dir):
+    def __init__(self, client: Client, input_dir, fingerprint_cache: FingerprintCache = None,
+                 image_source: str = BLOB_SOURCE, profiler: SampledProfiler = None):
         self.client = client
         self.input_dir = input_dir
+        # Reuses text-rule verdicts for near-duplicate copies of already seen posts
+        self.fingerprint_cache = fingerprint_cache
+        # Times posts and samples them under cProfile/tracemalloc (PROFILE_EVERY)
+        self.profiler = profiler or default_profiler()
         
         # Load T&S words and domains using pandas (Milestone 2)
         try:
@@ -35,90 +49,154 @@ class AutomatedLabeler:
         except Exception as e:
             self.news_df = None
             print(f"[INFO] No news-domains.csv found in {self.input_dir}: {e}")
+
+        # Parse the tables once instead of scanning the DataFrames on every post
+        self._parse_inputs()
         
         # Initialize dog detection (Milestone 4)
         self.dog_hashes = []
         dog_image_dir = os.path.join(self.input_dir, "dog-list-images")
         if os.path.exists(dog_image_dir):
-            self.dog_detector = DogImageDetector(dog_image_dir)
+            self.dog_detector = DogImageDetector(dog_image_dir, profiler=self.profiler)
         
-        self.image_extractor = ImageExtractor()
+        self.image_extractor = ImageExtractor(image_source)
+
+        # Identifies the rules in effect, so stored results can be reused
+        self.ruleset_version = ruleset_version(
+            RULES_VERSION,
+            image_source,
+            os.path.join(self.input_dir, "t-and-s-words.csv"),
+            os.path.join(self.input_dir, "t-and-s-domains.csv"),
+            os.path.join(self.input_dir, "news-domains.csv"),
+            dog_image_dir,
+            THRESH,
+        )
+
+        # Cheap text rules run inline while image hashing runs concurrently;
+        # a dog match is terminal and replaces any text labels
+        rules = [
+            Rule("t-and-s", cost=1, input="text_lower", evaluate=self._get_ts_labels),
+            Rule("t-and-s-links", cost=1, input="links", evaluate=self._get_ts_link_labels),
+            Rule("news", cost=2, input="domains", evaluate=self._get_news_labels_for_domains),
+        ]
+        if hasattr(self, 'dog_detector'):
+            rules.append(Rule("dog", cost=100, input="image_urls", evaluate=self._get_dog_labels,
+                              terminal=True, per_item=True, cancellable=True))
+        self.rule_engine = RuleEngine(rules)
     
+    def _parse_inputs(self):
+        """Build the word pattern and domain tables used by the rules"""
+        words, ts_domains, news_domains = [], [], []
+        if hasattr(self, 'word_df'):
+            words = [str(word).strip().lower() for word in self.word_df.iloc[:, 0]]
+        if hasattr(self, 'domain_df'):
+            ts_domains = [str(domain).strip().lower() for domain in self.domain_df.iloc[:, 0]]
+        if self.news_df is not None and self.news_df.shape[1] >= 2:
+            news_domains = [
+                (str(domain).strip().lower(), str(label).strip())
+                for domain, label in zip(self.news_df.iloc[:, 0], self.news_df.iloc[:, 1])
+            ]
+
+        # Whole-word match of any T&S word
+        self.ts_word_pattern = (
+            re.compile(r'\b(?:' + '|'.join(re.escape(word) for word in words) + r')\b')
+            if words else None
+        )
+        self.ts_domains = tuple(ts_domains)
+        # T&S entries may name a site section (e.g. github.com/<org>/<repo>),
+        # so links are matched on host and path prefix
+        self.ts_link_prefixes = []
+        for entry in ts_domains:
+            link = parse_link("//" + entry)
+            if link.host:
+                self.ts_link_prefixes.append((link.host, link.path.rstrip("/")))
+        self.news_domains = tuple(news_domains)
+
+    @property
+    def label_values(self) -> List[str]:
+        """Every label these rules can apply"""
+        return [T_AND_S_LABEL, DOG_LABEL] + sorted({label for _domain, label in self.news_domains})
+
     def _contains_ts_word(self, text: str) -> bool:
         """Check if text contains any Trust and Safety words (Milestone 2)"""
-        if not text or not hasattr(self, 'word_df') or self.word_df.empty:
+        if not text:
             return False
-        
-        text_lower = text.lower()
-        for _, row in self.word_df.iterrows():
-            word = str(row[0]).strip().lower()
-            # Use word boundary to match whole words
-            pattern = r'\b' + re.escape(word) + r'\b'
-            if re.search(pattern, text_lower):
-                return True
-        return False
+        return self._contains_ts_word_lower(text.lower())
+
+    def _contains_ts_word_lower(self, text_lower: str) -> bool:
+        """Check if already lowercased text contains any Trust and Safety words"""
+        if not text_lower or self.ts_word_pattern is None:
+            return False
+        return self.ts_word_pattern.search(text_lower) is not None
     
     def _contains_ts_domain(self, text: str) -> bool:
         """Check if text contains any Trust and Safety domains (Milestone 3)"""
-        if not text or not hasattr(self, 'domain_df') or self.domain_df.empty:
+        if not text:
             return False
-        
-        text_lower = text.lower()
-        for _, row in self.domain_df.iterrows():
-            domain = str(row[0]).strip().lower()
-            if domain in text_lower:
-                return True
-        return False
+        return self._contains_ts_domain_lower(text.lower())
+
+    def _contains_ts_domain_lower(self, text_lower: str) -> bool:
+        """Check if already lowercased text contains any Trust and Safety domains"""
+        if not text_lower:
+            return False
+        return any(domain in text_lower for domain in self.ts_domains)
+    
+    def _get_ts_labels(self, text_lower: str) -> List[str]:
+        """Label lowercased text containing T&S words or domains (Milestone 2)"""
+        if self._contains_ts_word_lower(text_lower) or self._contains_ts_domain_lower(text_lower):
+            return [T_AND_S_LABEL]
+        return []
+
+    def _get_ts_link_labels(self, links: List[Link]) -> List[str]:
+        """Label posts linking to a T&S site, matched on parsed link host and path (Milestone 3)"""
+        for link in links or []:
+            path = link.path.lower()
+            for host, prefix in self.ts_link_prefixes:
+                if link.host != host and not link.host.endswith(f".{host}"):
+                    continue
+                if not prefix or path == prefix or path.startswith(prefix + "/"):
+                    return [T_AND_S_LABEL]
+        return []
+
+    def _get_dog_labels(self, img_url: str, cancelled: threading.Event = None) -> List[str]:
+        """Label an image matching a reference dog image (Milestone 4)"""
+        if self.dog_detector.is_dog_image_url(img_url, self.image_extractor.fallback_urls(img_url),
+                                              cancelled=cancelled):
+            return [DOG_LABEL]
+        return []
     
     def _extract_urls(self, text: str) -> List[str]:
         """Extract URLs from text (Milestone 3)"""
-        if not text:
-            return []
-        
-        # Simple URL regex pattern
-        url_pattern = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+'
-        return re.findall(url_pattern, text)
+        return extract_text_urls(text)
     
     def _extract_domain(self, url: str) -> str:
         """Extract domain from URL (Milestone 3)"""
-        try:
-            parsed_url = urllib.parse.urlparse(url)
-            # Get domain without 'www.' prefix
-            domain = parsed_url.netloc.lower()
-            if domain.startswith('www.'):
-                domain = domain[4:]
-            return domain
-        except Exception:
-            return ""
+        return url_domain(url)
     
     def _get_news_labels(self, text: str) -> List[str]:
         """Extract labels for news sources linked in the text (Milestone 3)"""
-        if not text or not hasattr(self, 'news_df') or self.news_df is None or self.news_df.empty:
+        if not text:
             return []
         
         # Extract URLs from text
         urls = self._extract_urls(text)
-        if not urls:
-            return []
-        
+        return self._get_news_labels_for_domains([self._extract_domain(url) for url in urls])
+
+    def _get_news_labels_for_domains(self, domains: List[str]) -> List[str]:
+        """Extract labels for news sources among already parsed link domains (Milestone 3)"""
         # Track which news sources have been found to avoid duplicates
         found_labels = set()
         
         # Check each URL for news domains
-        for url in urls:
-            domain = self._extract_domain(url)
+        for domain in domains or []:
             if not domain:
                 continue
             
             # Check if this domain matches any of our news domains
-            for _, row in self.news_df.iterrows():
-                if len(row) >= 2:
-                    news_domain = str(row[0]).strip().lower()
-                    label = str(row[1]).strip()
-                    
-                    if domain == news_domain or domain.endswith(f".{news_domain}"):
-                        found_labels.add(label)
-                        break
+            for news_domain, label in self.news_domains:
+                if domain == news_domain or domain.endswith(f".{news_domain}"):
+                    found_labels.add(label)
+                    break
         
         return list(found_labels)
    
@@ -129,41 +207,56 @@ class AutomatedLabeler:
         # Get post data
         try:
             post_data = post_from_url(self.client, url)
-            if not post_data:
-                return []
-                
-            # Access the text content based on the actual structure
-            post_record = post_data.value
-            text = post_record.text if hasattr(post_record, 'text') else ""
-            
         except Exception as e:
             print(f"Error getting post: {e}")
             return []
-        
-        labels = []
-        
-        # Check for dog images (Milestone 4)
-        try:
-            if hasattr(self, 'dog_detector'):
-                image_urls = self.image_extractor.extract_image_urls(post_data)
-                for img_url in image_urls:
-                    if self.dog_detector.is_dog_image_url(img_url):
-                        return [DOG_LABEL]  # Return immediately for dog images
-        except Exception:
-            pass
-        
-        # Check for T&S words and domains (Milestone 2)
-        try:
-            if self._contains_ts_word(text) or self._contains_ts_domain(text):
-                labels.append(T_AND_S_LABEL)
-        except Exception as e:
-            print(f"Error checking T&S content: {e}")
-        
-        # Check for news sources (Milestone 3)
+
+        return self.moderate_post_data(post_data)
+
+    def moderate_post_data(self, post_data) -> List[str]:
+        """
+        Apply moderation to an already fetched post
+        """
+        if not post_data:
+            return []
+
         try:
-            news_labels = self._get_news_labels(text)
-            labels.extend(news_labels)
+            with profiled(self.profiler, "AutomatedLabeler.build_post_view"):
+                view = build_post_view(post_data, image_extractor=self.image_extractor)
         except Exception as e:
-            print(f"Error checking news sources: {e}")
-            
+            print(f"Error getting post: {e}")
+            return []
+
+        return self.moderate_view(view)
+
+    def moderate_view(self, view: PostView) -> List[str]:
+        """
+        Apply moderation to a preprocessed post view
+        """
+        with profiled(self.profiler, "AutomatedLabeler.moderate_view"):
+            return self._moderate_view(view)
+
+    def _moderate_view(self, view: PostView) -> List[str]:
+        inputs = {
+            "text_lower": view.lowered,
+            "domains": view.domains,
+            "links": view.links,
+            "image_urls": view.image_urls,
+        }
+
+        # Only text-only posts are cached: their verdict depends on nothing
+        # but the text and the linked hosts and paths (which must match exactly)
+        if (self.fingerprint_cache is None or view.image_urls
+                or len(view.tokens) < MIN_FINGERPRINT_TOKENS):
+            return self.rule_engine.run(inputs)
+
+        fingerprint = simhash(view.tokens)
+        namespace = tuple(sorted({(link.host, link.path.lower()) for link in view.links}))
+        cached = self.fingerprint_cache.lookup(fingerprint, namespace)
+        if cached is not None:
+            return cached.labels
+
+        labels = self.rule_engine.run(inputs)
+        self.fingerprint_cache.store(fingerprint, labels, evidence={"sample": view.text[:300]},
+                                     namespace=namespace)
         return labels
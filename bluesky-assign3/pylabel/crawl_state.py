@@ -0,0 +1,161 @@
+"""Persistent search crawl state: per-keyword cursors and a seen-URI Bloom filter"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01, bits: bytes = None, count: int = 0):
+        """
+        Initialize the filter.
+
+        Args:
+            capacity: Number of items it is sized for
+            error_rate: False positive rate at `capacity` items
+            bits: Serialized bit array to restore
+            count: Number of items already added to `bits`
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        # Double hashing: k positions from two independent hashes
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "bits": base64.b64encode(bytes(self.bits)).decode("ascii")}
+
+
+class RotatingBloomFilter:
+    """
+    Seen-set made of several Bloom filters covering consecutive windows.
+
+    New items go into the newest filter. Once it holds `window_size` items a
+    fresh filter is started and the oldest one is dropped, so the set
+    remembers roughly the last `windows * window_size` items in constant space.
+    """
+
+    def __init__(self, window_size: int = 50000, windows: int = 4, error_rate: float = 0.001):
+        self.window_size = window_size
+        self.windows = windows
+        self.error_rate = error_rate
+        self.filters: List[BloomFilter] = [BloomFilter(window_size, error_rate)]
+
+    def add(self, item: str):
+        if self.filters[-1].count >= self.window_size:
+            self.filters.append(BloomFilter(self.window_size, self.error_rate))
+            del self.filters[:-self.windows]
+        self.filters[-1].add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return any(item in bloom for bloom in self.filters)
+
+    def to_dict(self) -> dict:
+        return {
+            "window_size": self.window_size,
+            "windows": self.windows,
+            "error_rate": self.error_rate,
+            "filters": [bloom.to_dict() for bloom in self.filters],
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "RotatingBloomFilter":
+        seen = cls(state["window_size"], state["windows"], state["error_rate"])
+        seen.filters = [
+            BloomFilter(seen.window_size, seen.error_rate, base64.b64decode(bloom["bits"]), bloom["count"])
+            for bloom in state["filters"]
+        ] or seen.filters
+        return seen
+
+
+class CrawlState:
+    """
+    Search progress kept between runs of a crawl.
+
+    For every keyword it stores the timestamp of the newest post of the last
+    completed sweep through the "latest" results, and the cursor of a sweep
+    that was interrupted (e.g. by a post limit). A sweep stops as soon as it
+    reaches posts at or before the previous sweep's newest timestamp, so
+    scheduled runs only page through new posts. An interrupted first sweep
+    counts as complete, so the crawl never pages back through old results.
+    Seen post URIs are kept in a rotating Bloom filter and checked only on a
+    page an earlier run stopped partway through.
+    """
+
+    def __init__(self, path: Optional[str] = None, window_size: int = 50000, windows: int = 4):
+        """
+        Load the crawl state, or start an empty one.
+
+        Args:
+            path: JSON file the state is saved to and restored from
+            window_size: Post URIs per Bloom filter window
+            windows: Number of windows remembered
+        """
+        self.path = path
+        self.keywords: Dict[str, dict] = {}
+        self.seen = RotatingBloomFilter(window_size, windows)
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            self.keywords = state.get("keywords", {})
+            if "seen" in state:
+                self.seen = RotatingBloomFilter.from_dict(state["seen"])
+
+    def keyword(self, keyword: str) -> dict:
+        """
+        Progress of one keyword, with the keys newest_seen (watermark of the
+        last completed sweep), cursor and sweep_newest (of the sweep in
+        progress) and partial_page (the page at cursor was only partly
+        consumed). The returned dict is updated in place by the crawler.
+        """
+        with self._lock:
+            return self.keywords.setdefault(
+                keyword, {"newest_seen": None, "cursor": None, "sweep_newest": None, "partial_page": False}
+            )
+
+    def is_seen(self, uri: str) -> bool:
+        with self._lock:
+            return uri in self.seen
+
+    def mark_seen(self, uri: str):
+        with self._lock:
+            self.seen.add(uri)
+
+    def save(self):
+        """Atomically write the state to its JSON file"""
+        if not self.path:
+            return
+        with self._lock:
+            state = {"keywords": self.keywords, "seen": self.seen.to_dict()}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
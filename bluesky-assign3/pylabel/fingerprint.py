@@ -0,0 +1,164 @@
+"""Near-duplicate text fingerprinting to reuse verdicts for copy-paste spam"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Sequence
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 1
+# Texts with fewer tokens than this are too short to fingerprint reliably
+MIN_FINGERPRINT_TOKENS = 5
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(tokens: Sequence[str]) -> int:
+    """
+    Compute a 64-bit SimHash over word shingles (single words by default)
+    of the given tokens.
+
+    Texts that differ by a few words produce fingerprints within a small
+    Hamming distance of each other.
+    """
+    if len(tokens) >= SHINGLE_SIZE:
+        features = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    else:
+        features = [" ".join(tokens)]
+
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        h = _feature_hash(feature)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def simhash_text(text: str) -> int:
+    """SimHash of casefolded word tokens of a text"""
+    return simhash(TOKEN_PATTERN.findall(text.casefold()))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints"""
+    return bin(a ^ b).count("1")
+
+
+class CachedVerdict(NamedTuple):
+    """A verdict reused from a near-duplicate text"""
+
+    labels: List[str]
+    evidence: Any
+    distance: int
+
+
+class FingerprintCache:
+    """
+    Bounded LRU cache mapping SimHash fingerprints to verdicts.
+
+    A lookup hits when a cached fingerprint in the same namespace is within
+    the Hamming distance implied by `similarity`. Candidates are found with
+    a banded index (by the pigeonhole principle, two fingerprints within
+    distance d agree exactly on at least one of d + 1 bands), so lookups do
+    not scan the whole cache.
+    """
+
+    def __init__(self, max_entries: int = 10000, similarity: float = 0.85):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of fingerprints kept (least recently
+                used are evicted)
+            similarity: Minimum fraction of matching fingerprint bits for two
+                texts to share a verdict (1.0 only reuses exact duplicates)
+        """
+        if not 0.0 < similarity <= 1.0:
+            raise ValueError("similarity must be in (0, 1]")
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.max_distance = int((1.0 - similarity) * FINGERPRINT_BITS)
+        self.num_bands = self.max_distance + 1
+        self.band_bits = -(-FINGERPRINT_BITS // self.num_bands)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bands: Dict[tuple, set] = {}
+        self._lock = threading.Lock()
+
+    def _band_keys(self, namespace: Hashable, fingerprint: int) -> List[tuple]:
+        mask = (1 << self.band_bits) - 1
+        return [
+            (namespace, band, (fingerprint >> (band * self.band_bits)) & mask)
+            for band in range(self.num_bands)
+        ]
+
+    def lookup(self, fingerprint: int, namespace: Hashable = None) -> Optional[CachedVerdict]:
+        """
+        Find the verdict of a near-duplicate of the fingerprinted text.
+
+        Args:
+            fingerprint: SimHash of the text
+            namespace: Extra exact-match context (e.g. linked domains) that
+                must also agree for a verdict to be reused
+
+        Returns:
+            The cached verdict, or None on a miss
+        """
+        with self._lock:
+            best = None
+            for band_key in self._band_keys(namespace, fingerprint):
+                for candidate in self._bands.get(band_key, ()):
+                    distance = hamming_distance(fingerprint, candidate)
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (candidate, distance)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            key = (namespace, best[0])
+            self._entries.move_to_end(key)
+            labels, evidence = self._entries[key]
+            return CachedVerdict(list(labels), evidence, best[1])
+
+    def store(self, fingerprint: int, labels: List[str], evidence: Any = None, namespace: Hashable = None):
+        """Record the verdict computed for a fingerprinted text"""
+        with self._lock:
+            key = (namespace, fingerprint)
+            if key not in self._entries:
+                for band_key in self._band_keys(namespace, fingerprint):
+                    self._bands.setdefault(band_key, set()).add(fingerprint)
+            self._entries[key] = (list(labels), evidence)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                (old_namespace, old_fingerprint), _ = self._entries.popitem(last=False)
+                for band_key in self._band_keys(old_namespace, old_fingerprint):
+                    band = self._bands.get(band_key)
+                    if band is not None:
+                        band.discard(old_fingerprint)
+                        if not band:
+                            del self._bands[band_key]
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit statistics"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
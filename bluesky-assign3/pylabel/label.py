@@ -1,8 +1,11 @@
 """Command-line tool for labeling posts and accounts on Bluesky"""
 
 import argparse
+import csv
 import os
-from typing import List
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Set
 
 import requests
 from atproto import Client, models
@@ -10,10 +13,17 @@ from atproto_client.models.com.atproto.admin.defs import RepoRef
 from atproto_client.models.com.atproto.repo.strong_ref import Main
 from dotenv import load_dotenv
 
+from pylabel.session import labeler_client_for, login_client
+
 load_dotenv(override=True)
 USERNAME = os.getenv("USERNAME")
 PW = os.getenv("PW")
 
+# Maximum number of actors accepted by app.bsky.actor.getProfiles
+PROFILE_BATCH_SIZE = 25
+# Subjects per com.atproto.label.queryLabels request
+LABEL_QUERY_BATCH_SIZE = 50
+
 def did_from_handle(handle: str):
     """
     Resolve the DID associated with a handle.
@@ -42,55 +52,218 @@ def post_from_url(client: Client, url: str):
     return client.get_post(rkey, handle)
 
 
-def label_account(client: Client, handle: str, label_value: List[str]):
+def dids_from_handles(
+    client: Client, handles: Iterable[str], batch_size: int = PROFILE_BATCH_SIZE
+) -> Dict[str, str]:
     """
-    Apply a label to an account with the specified handle
+    Resolve the DIDs of many handles in batches via app.bsky.actor.getProfiles.
+
+    Args:
+        client (Client): Logged-in client used for the lookups.
+        handles (Iterable[str]): The handles to resolve.
+        batch_size (int): Number of handles per request (at most 25).
+
+    Returns:
+        Dict[str, str]: Mapping from lowercased handle to DID. Handles that
+        could not be resolved are missing from the mapping. Inputs that are
+        already DIDs map to themselves.
+    """
+    handles = list(dict.fromkeys(handle.lower() for handle in handles))
+    dids = {handle: handle for handle in handles if handle.startswith("did:")}
+    handles = [handle for handle in handles if handle not in dids]
+    for start in range(0, len(handles), batch_size):
+        batch = handles[start:start + batch_size]
+        try:
+            response = client.app.bsky.actor.get_profiles(
+                models.AppBskyActorGetProfiles.Params(actors=batch)
+            )
+        except Exception as e:
+            print(f"Error resolving handles {batch[0]}..{batch[-1]}: {e}")
+            continue
+        for profile in response.profiles:
+            dids[profile.handle.lower()] = profile.did
+    return dids
+
+
+def emit_label_event(client: Client, subject, label_value: List[str], negate_value: List[str] = None):
+    """
+    Emit one moderation event that adds and/or negates labels on a subject.
+
+    Args:
+        client (Client): Client proxied to the labeler service.
+        subject: RepoRef for an account or strong ref (Main) for a post.
+        label_value (List[str]): Labels to add.
+        negate_value (List[str]): Labels to retract.
     """
-    did = did_from_handle(handle)
     data = models.ToolsOzoneModerationEmitEvent.Data(
         created_by=client.me.did,
         event=models.ToolsOzoneModerationDefs.ModEventLabel(
-            create_label_vals=label_value,
-            negate_label_vals=[],
+            create_label_vals=list(label_value),
+            negate_label_vals=list(negate_value or []),
         ),
-        subject=RepoRef(did=did),
+        subject=subject,
         subject_blob_cids=[],
     )
     return client.tools.ozone.moderation.emit_event(data)
 
 
+def query_labels(
+    client: Client, subjects: Iterable[str], batch_size: int = LABEL_QUERY_BATCH_SIZE
+) -> Dict[str, Set[str]]:
+    """
+    Fetch the labels our labeler currently applies to many subjects.
+
+    Args:
+        client (Client): Client proxied to the labeler service.
+        subjects (Iterable[str]): Post URIs or account DIDs.
+        batch_size (int): Number of subjects per com.atproto.label.queryLabels request.
+
+    Returns:
+        Dict[str, Set[str]]: Mapping from every subject to its current label
+        values (empty if it has none).
+    """
+    subjects = list(dict.fromkeys(subjects))
+    current = {subject: set() for subject in subjects}
+    for start in range(0, len(subjects), batch_size):
+        batch = subjects[start:start + batch_size]
+        cursor = None
+        labels = []
+        while True:
+            response = client.com.atproto.label.query_labels(
+                models.ComAtprotoLabelQueryLabels.Params(
+                    uri_patterns=batch, sources=[client.me.did], limit=250, cursor=cursor
+                )
+            )
+            labels.extend(response.labels)
+            cursor = response.cursor
+            if not cursor or not response.labels:
+                break
+        # Apply labels and their negations in creation order
+        for label in sorted(labels, key=lambda label: label.cts):
+            if label.uri not in current:
+                continue
+            if label.neg:
+                current[label.uri].discard(label.val)
+            else:
+                current[label.uri].add(label.val)
+    return current
+
+
+def label_did(client: Client, did: str, label_value: List[str], negate_value: List[str] = None):
+    """
+    Apply a label to the account with the specified DID
+    """
+    return emit_label_event(client, RepoRef(did=did), label_value, negate_value)
+
+
+def label_account(client: Client, handle: str, label_value: List[str]):
+    """
+    Apply a label to an account with the specified handle
+    """
+    did = did_from_handle(handle)
+    return label_did(client, did, label_value)
+
+
+def label_accounts(
+    client: Client,
+    labeler_client: Client,
+    handles: Iterable[str],
+    label_value: List[str],
+    max_workers: int = 8,
+) -> List[Dict[str, str]]:
+    """
+    Apply a label to many accounts.
+
+    Handles are resolved in batches of PROFILE_BATCH_SIZE and the label
+    events are emitted with at most `max_workers` requests in flight.
+
+    Returns:
+        List[Dict[str, str]]: One report row per handle with the keys
+        handle, did, status ("labeled", "unresolved" or "failed") and error.
+    """
+    handles = list(dict.fromkeys(
+        handle.strip().lstrip("@").lower() for handle in handles if handle.strip()
+    ))
+    dids = dids_from_handles(client, handles)
+
+    def emit(handle: str) -> Dict[str, str]:
+        did = dids.get(handle)
+        if did is None:
+            return {"handle": handle, "did": "", "status": "unresolved", "error": ""}
+        try:
+            label_did(labeler_client, did, label_value)
+            return {"handle": handle, "did": did, "status": "labeled", "error": ""}
+        except Exception as e:
+            return {"handle": handle, "did": did, "status": "failed", "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(emit, handles))
+
+
+def read_handles(path: str) -> List[str]:
+    """
+    Read handles, one per line, from a file or from stdin if path is "-".
+    Blank lines and lines starting with '#' are ignored.
+    """
+    if path == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def write_report(rows: List[Dict[str, str]], path: str):
+    """
+    Write a per-handle labeling report as CSV (to stdout if path is "-")
+    """
+    fieldnames = ["handle", "did", "status", "error"]
+    if path == "-":
+        writer = csv.DictWriter(sys.stdout, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
 def label_post(
-    client: Client, labeler_client: Client, post_url: str, label_value: List[str]
+    client: Client,
+    labeler_client: Client,
+    post_url: str,
+    label_value: List[str],
+    post=None,
+    negate_value: List[str] = None,
 ):
     """
-    Apply a label to a post with the specified URL
+    Apply a label to a post with the specified URL.
+
+    If the post has already been fetched it can be passed as `post` to avoid
+    fetching it a second time. Labels in `negate_value` are retracted in the
+    same event.
     """
-    post = post_from_url(client, post_url)
+    if post is None:
+        post = post_from_url(client, post_url)
     post_ref = Main(cid=post.cid, uri=post.uri)
-    data = models.ToolsOzoneModerationEmitEvent.Data(
-        created_by=client.me.did,
-        event=models.ToolsOzoneModerationDefs.ModEventLabel(
-            create_label_vals=label_value,
-            negate_label_vals=[],
-        ),
-        subject=post_ref,
-        subject_blob_cids=[],
-    )
-    return labeler_client.tools.ozone.moderation.emit_event(data)
+    return emit_label_event(labeler_client, post_ref, label_value, negate_value)
 
 
 def main():
     """
     Main function for command-line tool.
     """
-    client = Client()
-    client.login(USERNAME, PW)
-    did = did_from_handle(USERNAME)
-    labeler_client = client.with_proxy("atproto_labeler", did)
+    client = login_client(USERNAME, PW)
+    labeler_client = labeler_client_for(client)
     parser = argparse.ArgumentParser()
     parser.add_argument("label_target", type=str)
     parser.add_argument("target_id", type=str)
     parser.add_argument("label_value", type=str)
+    parser.add_argument("--report", type=str, default="-",
+                        help="CSV report path for 'accounts' (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Maximum label events in flight for 'accounts'")
     args = parser.parse_args()
     label_target, target_id, label_value = (
         args.label_target,
@@ -102,6 +275,14 @@ def main():
         result = label_post(client, labeler_client, target_id, [label_value])
     elif label_target == "account":
         result = label_account(labeler_client, target_id, [label_value])
+    elif label_target == "accounts":
+        # target_id is a file of handles, one per line, or "-" for stdin
+        rows = label_accounts(
+            client, labeler_client, read_handles(target_id), [label_value], args.concurrency
+        )
+        write_report(rows, args.report)
+        labeled = sum(1 for row in rows if row["status"] == "labeled")
+        result = f"labeled {labeled} of {len(rows)} accounts"
     else:
         raise ValueError("Error: Invalid target")
 
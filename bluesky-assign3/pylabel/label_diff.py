@@ -0,0 +1,118 @@
+"""Emit only the label changes (additions and negations) for each subject"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from atproto import Client
+from atproto_client.models.com.atproto.admin.defs import RepoRef
+from atproto_client.models.com.atproto.repo.strong_ref import Main
+
+from pylabel.label import emit_label_event, query_labels
+from pylabel.result_store import ResultStore
+
+
+class LabelDiffEmitter:
+    """
+    Collects the desired labels of many subjects and emits only the difference
+    from what is already applied.
+
+    Desired labels are queued per subject (a post URI or an account DID);
+    queuing the same subject again merges its labels, so each subject gets at
+    most one moderation event per flush. On flush the current labels of all
+    queued subjects are looked up in bulk, first in the result store and then,
+    for subjects the store does not know, with com.atproto.label.queryLabels.
+    """
+
+    def __init__(
+        self,
+        labeler_client: Client,
+        store: Optional[ResultStore] = None,
+        managed_labels: Optional[Iterable[str]] = None,
+        query: bool = True,
+        throttle: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Initialize the emitter.
+
+        Args:
+            labeler_client: Client proxied to the labeler service
+            store: Result store caching the labels applied to each subject
+            managed_labels: Labels this emitter may retract (default: any
+                label); labels owned by other labelers are left alone
+            query: Ask the labeler service for subjects missing from the store
+                (otherwise they are assumed to have no labels)
+            throttle: Called before every emitted event, e.g. a rate limiter
+        """
+        self.labeler_client = labeler_client
+        self.store = store
+        self.managed_labels = set(managed_labels) if managed_labels is not None else None
+        self.query = query
+        self.throttle = throttle
+        # subject -> (ref, desired labels)
+        self._pending: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _queue(self, subject: str, ref, labels: Iterable[str]):
+        with self._lock:
+            _ref, desired = self._pending.setdefault(subject, (ref, set()))
+            desired.update(labels)
+
+    def set_post(self, uri: str, cid: str, labels: Iterable[str]):
+        """Queue the labels a post should have"""
+        self._queue(uri, Main(cid=cid, uri=uri), labels)
+
+    def set_account(self, did: str, labels: Iterable[str]):
+        """Queue the labels an account should have"""
+        self._queue(did, RepoRef(did=did), labels)
+
+    def current_labels(self, subjects: List[str]) -> Dict[str, set]:
+        """Bulk lookup of the labels currently applied to the subjects"""
+        current = self.store.applied_labels(subjects) if self.store else {}
+        missing = [subject for subject in subjects if subject not in current]
+        if missing and self.query:
+            try:
+                current.update(query_labels(self.labeler_client, missing))
+            except Exception as e:
+                print(f"[ERROR] Failed to query current labels, assuming none: {e}")
+        for subject in missing:
+            current.setdefault(subject, set())
+        return current
+
+    def flush(self) -> List[Dict]:
+        """
+        Emit one event per queued subject whose labels changed.
+
+        Returns:
+            List[Dict]: One row per subject with the keys subject, added,
+            negated, status ("emitted", "unchanged" or "failed") and error.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return []
+
+        current = self.current_labels(list(pending))
+        rows = []
+        for subject, (ref, desired) in pending.items():
+            applied = current[subject]
+            added = sorted(desired - applied)
+            negated = applied - desired
+            if self.managed_labels is not None:
+                negated &= self.managed_labels
+            negated = sorted(negated)
+            row = {"subject": subject, "added": added, "negated": negated, "status": "unchanged", "error": ""}
+            if added or negated:
+                try:
+                    if self.throttle is not None:
+                        self.throttle()
+                    emit_label_event(self.labeler_client, ref, added, negated)
+                    row["status"] = "emitted"
+                except Exception as e:
+                    row["status"], row["error"] = "failed", str(e)
+            if self.store and row["status"] != "failed":
+                self.store.set_applied_labels(subject, (applied - set(negated)) | set(added))
+            rows.append(row)
+        return rows
@@ -0,0 +1,98 @@
+"""Extraction of links from a post's facets and embeds"""
+
+import re
+import urllib.parse
+from typing import Any, List, NamedTuple
+
+LINK_FEATURE_TYPE = "app.bsky.richtext.facet#link"
+
+# Simple URL regex pattern, only used when a record has no structured links
+URL_PATTERN = re.compile(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+')
+
+
+class Link(NamedTuple):
+    """A link in a post, parsed once"""
+
+    url: str
+    host: str  # lowercased, without 'www.'
+    path: str
+
+
+def _get(obj: Any, name: str):
+    """Read a field from either a model object or a raw record dict"""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def _type_of(obj: Any) -> str:
+    if isinstance(obj, dict):
+        return obj.get("$type", "")
+    return getattr(obj, "py_type", "") or ""
+
+
+def parse_link(url: str) -> Link:
+    """Split a URL into a Link with a normalized host"""
+    try:
+        parsed = urllib.parse.urlsplit(url)
+    except ValueError:
+        return Link(url, "", "")
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return Link(url, host, parsed.path)
+
+
+def _facet_uris(record: Any) -> List[str]:
+    uris = []
+    for facet in _get(record, "facets") or []:
+        for feature in _get(facet, "features") or []:
+            uri = _get(feature, "uri")
+            if uri and (_type_of(feature) in ("", LINK_FEATURE_TYPE)):
+                uris.append(uri)
+    return uris
+
+
+def _embed_uris(record: Any) -> List[str]:
+    embed = _get(record, "embed")
+    if embed is None:
+        return []
+    # app.bsky.embed.recordWithMedia wraps the external embed in `media`
+    for candidate in (embed, _get(embed, "media")):
+        uri = _get(_get(candidate, "external"), "uri")
+        if uri:
+            return [uri]
+    return []
+
+
+def extract_links(record: Any = None, text: str = None) -> List[Link]:
+    """
+    Extract the links of a post.
+
+    Full URIs are read from the record's link facets and its external embed,
+    since the post text only shows a shortened form of each link. The text is
+    scanned with a regex only when the record carries no structured links.
+
+    Args:
+        record: Post record (model object or raw dict), if available
+        text: Post text; defaults to the record's text
+
+    Returns:
+        List of unique links, in order of appearance
+    """
+    if text is None:
+        text = _get(record, "text") or ""
+
+    uris = _facet_uris(record) + _embed_uris(record)
+    if not uris:
+        uris = URL_PATTERN.findall(text)
+
+    links, seen = [], set()
+    for uri in uris:
+        if uri in seen:
+            continue
+        seen.add(uri)
+        links.append(parse_link(uri))
+    return links
@@ -0,0 +1,113 @@
+"""Composite labeler that runs several labelers over one shared view of a post"""
+
+from typing import List
+
+from atproto import Client
+
+from image_extractor import BLOB_SOURCE, ImageExtractor
+from ruleset import ruleset_version
+from pylabel.label import post_from_url
+from pylabel.post_view import PostView, build_post_view
+
+
+class CompositeLabeler:
+    """
+    Runs every registered labeler against a single fetch of each post.
+
+    The post is fetched once and preprocessed once into a PostView (text
+    normalization, tokens, parsed URLs, image CIDs); each labeler then only
+    runs its own rules via `moderate_view(view) -> List[str]`. The view's
+    image URLs are built once, so all labelers share one image source.
+    """
+
+    def __init__(self, client: Client, labelers: List = None, image_source: str = None):
+        """
+        Initialize the composite labeler.
+
+        Args:
+            client: Client used to fetch posts
+            labelers: Labelers implementing moderate_view (more can be added
+                with register)
+            image_source: Image URLs to build (see image_extractor); by
+                default the source the labelers were configured with
+        """
+        self.client = client
+        self.labelers = []
+        if image_source is None:
+            sources = {_image_source(labeler) for labeler in labelers or []} - {None}
+            image_source = sources.pop() if len(sources) == 1 else BLOB_SOURCE
+        self.image_extractor = ImageExtractor(image_source)
+        for labeler in labelers or []:
+            self.register(labeler)
+
+    def register(self, labeler):
+        """Add a labeler to run on every post"""
+        source = _image_source(labeler)
+        if source not in (None, self.image_extractor.source):
+            raise ValueError(
+                f"{type(labeler).__name__} uses {source} images but the composite builds "
+                f"{self.image_extractor.source} image URLs"
+            )
+        self.labelers.append(labeler)
+        return labeler
+
+    @property
+    def ruleset_version(self) -> str:
+        """Combined ruleset version of all registered labelers"""
+        return ruleset_version(
+            self.image_extractor.source,
+            *(getattr(labeler, "ruleset_version", type(labeler).__name__) for labeler in self.labelers),
+        )
+
+    def moderate_view(self, view: PostView) -> List[str]:
+        """
+        Run all labelers on a preprocessed view and merge their labels.
+        """
+        labels = []
+        for labeler in self.labelers:
+            try:
+                for label in labeler.moderate_view(view):
+                    if label not in labels:
+                        labels.append(label)
+            except Exception as e:
+                print(f"Error running {type(labeler).__name__}: {e}")
+        return labels
+
+    def moderate_post_data(self, post_data, url: str = None) -> List[str]:
+        """
+        Apply all labelers to an already fetched post
+        """
+        if not post_data:
+            return []
+        view = build_post_view(post_data, url=url, image_extractor=self.image_extractor)
+        return self.moderate_view(view)
+
+    def moderate_text(self, text: str) -> List[str]:
+        """
+        Apply all labelers to raw post text (image rules are skipped)
+        """
+        return self.moderate_view(build_post_view(text=text))
+
+    def moderate_record(self, record: dict, uri: str = None) -> List[str]:
+        """
+        Apply all labelers to a raw post record (JSON dictionary)
+        """
+        view = build_post_view(record=record, uri=uri, image_extractor=self.image_extractor)
+        return self.moderate_view(view)
+
+    def moderate_post(self, url: str) -> List[str]:
+        """
+        Apply all labelers to the post specified by the given url
+        """
+        try:
+            post_data = post_from_url(self.client, url)
+        except Exception as e:
+            print(f"Error getting post: {e}")
+            return []
+        return self.moderate_post_data(post_data, url=url)
+
+
+def _image_source(labeler):
+    """Image source a labeler was configured with, if it checks images"""
+    extractor = getattr(labeler, "image_extractor", None) or getattr(labeler, "extractor", None)
+    return getattr(extractor, "source", None)
@@ -0,0 +1,110 @@
+"""Shared, preprocessed view of a post used by all labelers"""
+
+import re
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from image_extractor import ImageExtractor
+from pylabel.link_extractor import URL_PATTERN, Link, extract_links, parse_link
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def extract_text_urls(text: str) -> List[str]:
+    """Extract URLs from post text"""
+    if not text:
+        return []
+    return URL_PATTERN.findall(text)
+
+
+def url_domain(url: str) -> str:
+    """Extract the lowercased domain (without 'www.') from a URL"""
+    return parse_link(url).host
+
+
+@dataclass
+class PostView:
+    """
+    A post fetched and normalized once, shared by every labeler.
+
+    Attributes:
+        text: Original post text
+        lowered: Lowercased text
+        casefolded: Casefolded text, for caseless matching
+        tokens: Word tokens of the casefolded text
+        links: Links of the post, read from facets and embeds
+        urls: Full URLs of `links`
+        domains: Hosts of `links` (lowercased, without 'www.')
+        image_cids: Blob CIDs of embedded images
+        image_urls: URLs from which the embedded images are fetched
+        url: bsky.app URL of the post, if known
+        post: Raw getPost response, if the post was fetched
+    """
+
+    text: str
+    lowered: str
+    casefolded: str
+    tokens: List[str]
+    links: List[Link] = field(default_factory=list)
+    urls: List[str] = field(default_factory=list)
+    domains: List[str] = field(default_factory=list)
+    image_cids: List[str] = field(default_factory=list)
+    image_urls: List[str] = field(default_factory=list)
+    url: Optional[str] = None
+    post: Any = None
+
+
+def build_post_view(
+    post_data=None,
+    url: str = None,
+    text: str = None,
+    image_extractor: ImageExtractor = None,
+    record: Dict[str, Any] = None,
+    uri: str = None,
+) -> PostView:
+    """
+    Preprocess a post once for all labelers.
+
+    Args:
+        post_data: Response of client.get_post(), if the post was fetched
+        url: bsky.app URL of the post (optional)
+        text: Raw post text, used when no post_data is available
+        image_extractor: Extractor used to find embedded images
+        record: Raw post record (JSON dictionary), used when no post_data
+            is available
+        uri: at:// URI of a raw record, used to find its author's DID
+
+    Returns:
+        PostView: The shared view of the post
+    """
+    extractor = image_extractor or ImageExtractor()
+    image_cids, did = [], None
+    if post_data is not None:
+        record = post_data.value
+        text = record.text if hasattr(record, 'text') else ""
+        image_cids = extractor.extract_image_cids(post_data)
+        did = extractor.author_did(post_data)
+    elif record is not None:
+        text = record.get("text", "")
+        image_cids = extractor.extract_raw_image_cids(record)
+        did = extractor.author_did(SimpleNamespace(uri=uri))
+    text = text or ""
+
+    casefolded = text.casefold()
+    links = extract_links(record, text)
+
+    return PostView(
+        text=text,
+        lowered=text.lower(),
+        casefolded=casefolded,
+        tokens=TOKEN_PATTERN.findall(casefolded),
+        links=links,
+        urls=[link.url for link in links],
+        domains=[link.host for link in links if link.host],
+        image_cids=image_cids,
+        # Blobs are served per account, so without the author there is no URL
+        image_urls=[extractor.image_url(cid, did) for cid in image_cids] if did else [],
+        url=url,
+        post=post_data,
+    )
@@ -0,0 +1,206 @@
+"""Persistent store of labeling results keyed by post URI, CID and ruleset version"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from ruleset import ruleset_version
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS post_results (
+    uri TEXT NOT NULL,
+    cid TEXT NOT NULL,
+    ruleset_version TEXT NOT NULL,
+    url TEXT,
+    labels TEXT NOT NULL,
+    emitted INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (uri, cid, ruleset_version)
+);
+CREATE INDEX IF NOT EXISTS post_results_url ON post_results (url, ruleset_version);
+CREATE TABLE IF NOT EXISTS applied_labels (
+    subject TEXT PRIMARY KEY,
+    labels TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class StoredResult(NamedTuple):
+    """A labeling result recorded in the store"""
+
+    uri: str
+    cid: str
+    labels: List[str]
+    emitted: bool
+
+
+class ResultStore:
+    """
+    SQLite-backed record of which posts have been labeled, and with what.
+
+    A result is identified by (post URI, post CID, ruleset version), so a
+    change of rules, or a new CID for the same post, needs a new result.
+    Results are also indexed by post URL so callers can skip already-decided
+    posts before doing any network I/O. A URL lookup cannot see the post's
+    current CID, so a post skipped that way is not re-evaluated after an edit
+    until the rules change.
+
+    Separately, the labels currently applied to each subject (post URI or
+    account DID) are tracked so that only changes need to be emitted.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the result store.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, uri: str, cid: str, version: str) -> Optional[List[str]]:
+        """
+        Look up the labels recorded for a post.
+
+        Returns:
+            The recorded labels, or None if the post has not been decided.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT labels FROM post_results WHERE uri = ? AND cid = ? AND ruleset_version = ?",
+                (uri, cid, version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lookup_urls(self, urls: Iterable[str], version: str) -> Dict[str, StoredResult]:
+        """
+        Bulk lookup of decided posts by URL.
+
+        The URLs are loaded into a temporary table and joined in a single
+        query, so large batches do not hit SQLite's bound-parameter limit.
+
+        Args:
+            urls: Post URLs to look up
+            version: Ruleset version the results must have been computed with
+
+        Returns:
+            Mapping from each already-decided URL to its most recently
+            updated result (a URL can have one result per CID).
+        """
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_urls (url TEXT PRIMARY KEY)")
+            cur.execute("DELETE FROM lookup_urls")
+            cur.executemany(
+                "INSERT OR IGNORE INTO lookup_urls (url) VALUES (?)", ((url,) for url in urls)
+            )
+            rows = cur.execute(
+                "SELECT r.url, r.uri, r.cid, r.labels, r.emitted FROM post_results r "
+                "JOIN lookup_urls l ON r.url = l.url WHERE r.ruleset_version = ? "
+                # Later rows win in the dict below
+                "ORDER BY r.updated_at, r.rowid",
+                (version,),
+            ).fetchall()
+            cur.execute("DELETE FROM lookup_urls")
+            self._conn.commit()
+        return {
+            url: StoredResult(uri, cid, json.loads(labels), bool(emitted))
+            for url, uri, cid, labels, emitted in rows
+        }
+
+    def filter_undecided(self, urls: Iterable[str], version: str) -> List[str]:
+        """Return the URLs (in input order) that have no result for this ruleset version"""
+        urls = list(urls)
+        decided = self.lookup_urls(urls, version)
+        return [url for url in urls if url not in decided]
+
+    def record(self, uri: str, cid: str, version: str, labels: List[str], url: str = None):
+        """Record the labels computed for a post"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO post_results (uri, cid, ruleset_version, url, labels, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (uri, cid, ruleset_version) DO UPDATE SET "
+                "url = COALESCE(excluded.url, url), labels = excluded.labels, "
+                "updated_at = excluded.updated_at",
+                (uri, cid, version, url, json.dumps(sorted(labels)), time.time()),
+            )
+            self._conn.commit()
+
+    def is_emitted(self, uri: str, cid: str, version: str) -> bool:
+        """Check whether the labels for a post have already been emitted"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT emitted FROM post_results WHERE uri = ? AND cid = ? AND ruleset_version = ?",
+                (uri, cid, version),
+            ).fetchone()
+        return bool(row and row[0])
+
+    def mark_emitted(self, uri: str, cid: str, version: str):
+        """Record that the labels for a post have been emitted"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE post_results SET emitted = 1, updated_at = ? "
+                "WHERE uri = ? AND cid = ? AND ruleset_version = ?",
+                (time.time(), uri, cid, version),
+            )
+            self._conn.commit()
+
+    def applied_labels(self, subjects: Iterable[str]) -> Dict[str, Set[str]]:
+        """
+        Bulk lookup of the labels last emitted for each subject.
+
+        Returns:
+            Mapping from each known subject to its applied labels. Subjects
+            that were never emitted through the store are missing.
+        """
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_subjects (subject TEXT PRIMARY KEY)")
+            cur.execute("DELETE FROM lookup_subjects")
+            cur.executemany(
+                "INSERT OR IGNORE INTO lookup_subjects (subject) VALUES (?)",
+                ((subject,) for subject in subjects),
+            )
+            rows = cur.execute(
+                "SELECT a.subject, a.labels FROM applied_labels a "
+                "JOIN lookup_subjects l ON a.subject = l.subject"
+            ).fetchall()
+            cur.execute("DELETE FROM lookup_subjects")
+            self._conn.commit()
+        return {subject: set(json.loads(labels)) for subject, labels in rows}
+
+    def set_applied_labels(self, subject: str, labels: Iterable[str]):
+        """Record the labels now applied to a subject"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO applied_labels (subject, labels, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (subject) DO UPDATE SET "
+                "labels = excluded.labels, updated_at = excluded.updated_at",
+                (subject, json.dumps(sorted(labels)), time.time()),
+            )
+            self._conn.commit()
@@ -0,0 +1,143 @@
+"""Cost-aware execution of labeling rules"""
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+# Rules at or above this cost are run on the worker pool instead of inline
+EXPENSIVE_COST = 10
+
+
+@dataclass
+class Rule:
+    """
+    A single labeling rule.
+
+    Attributes:
+        name: Name used in error messages
+        cost: Relative cost of evaluating the rule; cheap rules run inline,
+            expensive ones (>= EXPENSIVE_COST) run concurrently on the pool
+        input: Key of the post input the rule consumes (e.g. "text")
+        evaluate: Function mapping the input to a list of labels
+        terminal: If the rule produces labels, they replace every other label
+            and outstanding work is cancelled
+        per_item: Evaluate each element of the input separately, so e.g.
+            every image of a post is checked concurrently
+        cancellable: Pass the run's cancellation event as a second argument,
+            so long-running evaluations can stop early once a terminal rule
+            has fired
+    """
+
+    name: str
+    cost: int
+    input: str
+    evaluate: Callable[[Any], List[str]]
+    terminal: bool = False
+    per_item: bool = False
+    cancellable: bool = False
+
+
+class RuleEngine:
+    """
+    Runs a set of rules against a post's inputs.
+
+    Expensive rules are submitted to a thread pool first, then cheap rules are
+    evaluated inline (cheapest first) while the expensive work is in flight.
+    As soon as a terminal rule fires, pending work is cancelled and only the
+    terminal labels are returned. Otherwise non-terminal labels are returned
+    in rule declaration order.
+    """
+
+    def __init__(self, rules: List[Rule], max_workers: int = 4):
+        self.rules = rules
+        self.max_workers = max_workers
+        self._executor = None
+        # The engine is shared across threads; create the pool only once
+        self._executor_lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    @staticmethod
+    def _safe_evaluate(rule: Rule, value: Any, cancelled: threading.Event = None) -> List[str]:
+        if cancelled is not None and cancelled.is_set():
+            return []
+        try:
+            if rule.cancellable:
+                return rule.evaluate(value, cancelled) or []
+            return rule.evaluate(value) or []
+        except Exception as e:
+            print(f"Error evaluating rule {rule.name}: {e}")
+            return []
+
+    def run(self, inputs: Dict[str, Any]) -> List[str]:
+        """
+        Evaluate all rules against the given inputs.
+
+        Args:
+            inputs: Mapping from input name to value (rules whose input is
+                missing or empty are skipped)
+
+        Returns:
+            List of labels for the post
+        """
+        cancelled = threading.Event()
+        results: Dict[int, List[str]] = {}
+        pending = {}
+
+        # Start expensive work first so it overlaps with the cheap rules
+        for index, rule in enumerate(self.rules):
+            value = inputs.get(rule.input)
+            if rule.cost < EXPENSIVE_COST or not value:
+                continue
+            items = value if rule.per_item else [value]
+            for item in items:
+                future = self._pool().submit(self._safe_evaluate, rule, item, cancelled)
+                pending[future] = index
+
+        def cancel_outstanding():
+            cancelled.set()
+            for future in pending:
+                future.cancel()
+
+        cheap = [
+            (index, rule) for index, rule in enumerate(self.rules)
+            if rule.cost < EXPENSIVE_COST and inputs.get(rule.input)
+        ]
+        for index, rule in sorted(cheap, key=lambda item: item[1].cost):
+            value = inputs[rule.input]
+            items = value if rule.per_item else [value]
+            for item in items:
+                labels = self._safe_evaluate(rule, item)
+                if labels and rule.terminal:
+                    cancel_outstanding()
+                    return list(labels)
+                results.setdefault(index, []).extend(labels)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                labels = future.result()
+                if labels and self.rules[index].terminal:
+                    cancel_outstanding()
+                    return list(labels)
+                results.setdefault(index, []).extend(labels)
+
+        labels = []
+        for index in sorted(results):
+            for label in results[index]:
+                if label not in labels:
+                    labels.append(label)
+        return labels
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
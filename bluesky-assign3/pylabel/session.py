@@ -0,0 +1,112 @@
+"""Persisted login sessions, so runs reuse a session instead of calling createSession"""
+
+import os
+import re
+import threading
+from typing import Optional
+
+from atproto import Client
+
+SESSION_DIR = os.getenv("SESSION_DIR", os.path.join(os.path.expanduser("~"), ".config", "pylabel"))
+
+
+def _default_session_path(username: str) -> str:
+    safe_name = re.sub(r"[^\w.-]", "_", username or "default")
+    return os.path.join(SESSION_DIR, f"session-{safe_name}.txt")
+
+
+class SessionManager:
+    """
+    Stores a client's exported session string on disk and reuses it.
+
+    The session file is readable only by the current user. It is rewritten
+    whenever the session is created or refreshed, so the next run can resume
+    with it; a password login (createSession) only happens when there is no
+    stored session or it can no longer be refreshed.
+    """
+
+    def __init__(self, username: str, path: Optional[str] = None):
+        """
+        Initialize the session manager.
+
+        Args:
+            username: Handle of the account
+            path: Session file (default: $SESSION_DIR/session-<username>.txt)
+        """
+        self.username = username
+        self.path = path or _default_session_path(username)
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[str]:
+        """Read the stored session string, if any"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def save(self, session_string: str):
+        """Atomically write the session string with owner-only permissions"""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(session_string)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Delete the stored session"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _on_session_change(self, event, session):
+        # Imported sessions are already on disk; only persist new tokens
+        if getattr(event, "value", event) in ("create", "refresh"):
+            self.save(session.export())
+
+    def login(self, client: Client, password: str) -> Client:
+        """
+        Log the client in, reusing (and if needed refreshing) the stored
+        session and falling back to a password login.
+
+        Returns:
+            Client: The logged-in client
+        """
+        client.on_session_change(self._on_session_change)
+
+        session_string = self.load()
+        if session_string:
+            try:
+                client.login(session_string=session_string)
+                return client
+            except Exception as e:
+                print(f"[INFO] Stored session could not be reused, logging in with password: {e}")
+                self.clear()
+
+        client.login(self.username, password)
+        return client
+
+
+def login_client(username: str, password: str, client: Optional[Client] = None) -> Client:
+    """
+    Create (or take) a client and log it in through a SessionManager.
+    """
+    client = client or Client()
+    return SessionManager(username).login(client, password)
+
+
+def labeler_client_for(client: Client) -> Client:
+    """
+    Get a client proxied to the logged-in account's labeler service.
+
+    The DID comes from the current session rather than a resolveHandle
+    request, and the returned clone shares the session of `client`.
+    """
+    labeler_client = client.with_proxy("atproto_labeler", client.me.did)
+    labeler_client.me = client.me
+    return labeler_client
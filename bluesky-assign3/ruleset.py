@@ -0,0 +1,32 @@
+"""Ruleset versions identifying the rules a stored labeling result was computed with"""
+
+import hashlib
+import os
+
+
+def ruleset_version(*parts) -> str:
+    """
+    Compute a short, stable version string for a ruleset.
+
+    Args:
+        parts: Strings, bytes or file paths describing the rules. Paths to
+            existing files (or directories of files) are hashed by content.
+
+    Returns:
+        str: Hex digest identifying the ruleset.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            digest.update(part)
+        elif isinstance(part, str) and os.path.isfile(part):
+            with open(part, "rb") as f:
+                digest.update(f.read())
+        elif isinstance(part, str) and os.path.isdir(part):
+            for filename in sorted(os.listdir(part)):
+                digest.update(filename.encode("utf-8"))
+                digest.update(str(os.path.getsize(os.path.join(part, filename))).encode("utf-8"))
+        else:
+            digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
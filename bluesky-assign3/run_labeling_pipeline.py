@@ -1,53 +1,335 @@
+"""
+Real-time panic-language labeling pipeline.
+
+Posts flow through three concurrent stages joined by bounded queues:
+
+    collect (search) -> classify (PanicLanguageLabeler) -> emit (label_post)
+
+Each stage has its own worker count, and the bounded queues apply
+backpressure so memory stays flat. Labels start going out as soon as the
+first matching post is found instead of after collection finishes.
+"""
+
+import argparse
 import os
+import queue
+import threading
 import time
 from dotenv import load_dotenv
-from atproto import Client
+from atproto_client.models.com.atproto.repo.strong_ref import Main
 
-from create_csv import search_and_collect_posts
-from policy_proposal_labeler import PanicLanguageLabeler
-from pylabel.label import label_post, did_from_handle
+from create_csv import iter_search_posts
+from policy_proposal_labeler import PANIC_LABEL, PanicLanguageLabeler
+from pylabel.account_aggregator import AccountAggregator
+from pylabel.crawl_state import CrawlState
+from pylabel.fingerprint import FingerprintCache
+from pylabel.label import label_did, label_post
+from pylabel.label_diff import LabelDiffEmitter
+from pylabel.result_store import ResultStore
+from pylabel.session import labeler_client_for, login_client
 
 # Load login credentials
 load_dotenv()
 USERNAME = os.getenv("USERNAME", "")
 PASSWORD = os.getenv("PW")
+RESULT_STORE = os.getenv(
+    "RESULT_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "output-csv", "results.sqlite")
+)
 
-# Step 1: Set up clients
-client = Client()
-client.login(USERNAME, PASSWORD)
-labeler_did = did_from_handle(USERNAME)
-labeler_client = client.with_proxy("atproto_labeler", labeler_did)
+ACCOUNT_STATE = os.path.join(os.path.dirname(RESULT_STORE), "account-counts.json")
+CRAWL_STATE = os.path.join(os.path.dirname(RESULT_STORE), "crawl-state.json")
 
-# Step 2: Initialize labeler logic
-labeler = PanicLanguageLabeler(keyword_threshold=2)
-
-# Step 3: Scrape panic-related posts (real-time)
 PANIC_KEYWORDS = [
     "emergency", "breaking", "alert", "urgent", "evacuate", "crisis",
     "do not ignore", "act now", "warning", "immediately", "catastrophe",
     "panic", "danger", "critical", "disaster"
 ]
 
-posts = search_and_collect_posts(PANIC_KEYWORDS, max_posts=500, per_keyword_limit=50)
+# Marks the end of a queue's input for one consumer
+_DONE = object()
+
+
+class RateLimiter:
+    """Spaces out calls shared by several threads by a minimum interval"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._next_at - now)
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay:
+            time.sleep(delay)
+
+
+class LabelingPipeline:
+    """Collect -> classify -> emit stages running concurrently"""
+
+    def __init__(self, client, labeler_client, labeler, store, args, aggregator=None, crawl_state=None):
+        self.client = client
+        self.labeler_client = labeler_client
+        self.labeler = labeler
+        self.store = store
+        self.args = args
+        self.aggregator = aggregator
+        self.crawl_state = crawl_state
+        self.keywords = queue.Queue()
+        self.to_classify = queue.Queue(maxsize=args.queue_size)
+        self.to_emit = queue.Queue(maxsize=args.queue_size)
+        self.rate_limiter = RateLimiter(args.emit_interval)
+        self.diff_emitter = None
+        if args.diff_labels:
+            self.diff_emitter = LabelDiffEmitter(
+                labeler_client, store, managed_labels=[PANIC_LABEL], throttle=self.rate_limiter.wait
+            )
+        # uri -> cid of posts queued on the diff emitter
+        self._diff_posts = {}
+        self.seen_texts = set()
+        self._collected = 0
+        self._lock = threading.Lock()
+
+    def _take_slot(self) -> bool:
+        """Reserve one of the max_posts collection slots"""
+        with self._lock:
+            if self._collected >= self.args.max_posts:
+                return False
+            self._collected += 1
+            return True
+
+    def _release_slot(self):
+        with self._lock:
+            self._collected -= 1
+
+    def collect(self):
+        while True:
+            try:
+                keyword = self.keywords.get_nowait()
+            except queue.Empty:
+                return
+            posts = iter_search_posts(
+                [keyword],
+                max_posts=self.args.per_keyword_limit,
+                per_keyword_limit=self.args.per_keyword_limit,
+                client=self.client,
+                seen_texts=self.seen_texts,
+                state=self.crawl_state,
+            )
+            # Reserve a slot before pulling a post, so no crawled post is dropped
+            while self._take_slot():
+                post = next(posts, None)
+                if post is None:
+                    self._release_slot()
+                    break
+                # Blocks when classification falls behind
+                self.to_classify.put(post)
+            else:
+                posts.close()
+                return
+
+    def _next_batch(self) -> list:
+        """Wait for one queued post, then take the posts already queued behind it"""
+        batch = [self.to_classify.get()]
+        while batch[-1] is not _DONE and len(batch) < self.args.classify_batch:
+            try:
+                batch.append(self.to_classify.get_nowait())
+            except queue.Empty:
+                break
+        return batch
 
-# Step 4: Apply rule-based labeler and emit if matched
-for post in posts:
-    text = post['text']
-    creator = post['creator']
-    rkey = post.get('rkey')  # scraping code should include this
-    if not rkey:
-        print(f"⚠️ Skipping post from {creator} — missing rkey.")
-        continue
+    def classify(self):
+        while True:
+            batch = self._next_batch()
+            done = batch[-1] is _DONE
+            if done:
+                batch.pop()
+            posts = []
+            for post in batch:
+                creator = post['creator']
+                rkey = post.get('rkey')  # scraping code should include this
+                if not rkey:
+                    print(f"⚠️ Skipping post from {creator} — missing rkey.")
+                    continue
+                posts.append((post, f"https://bsky.app/profile/{creator}/post/{rkey}"))
 
+            # One result store lookup for everything drained from the queue
+            try:
+                decided = self.store.lookup_urls([post_url for _post, post_url in posts],
+                                                 self.labeler.ruleset_version)
+            except Exception as e:
+                print(f"[ERROR] Failed to look up {len(posts)} posts in the result store: {e}")
+                decided = {}
+            for post, post_url in posts:
+                try:
+                    self._classify_post(post, post_url, decided.get(post_url))
+                except Exception as e:
+                    print(f"[ERROR] Failed to classify {post_url}: {e}")
+            if done:
+                return
 
-    label = labeler.moderate_post(text)
+    def _classify_post(self, post, post_url, previous):
+        # Skip posts already decided (and emitted) under the current rules.
+        # Diffed emission also sends unlabeled posts, to retract stale labels.
+        if previous and (previous.emitted or not (previous.labels or self.diff_emitter)):
+            return
 
-    if label:
-        post_url = f"https://bsky.app/profile/{creator}/post/{rkey}"
+        if previous:
+            label = previous.labels[0] if previous.labels else None
+        else:
+            label = self.labeler.moderate_post(post['text'])
+            self.store.record(post['uri'], post['cid'], self.labeler.ruleset_version,
+                              [label] if label else [], url=post_url)
+
+        if label or self.diff_emitter is not None:
+            # Blocks when emission falls behind
+            self.to_emit.put((post, post_url, label))
+
+    def emit(self):
+        while True:
+            item = self.to_emit.get()
+            if item is _DONE:
+                return
+            post, post_url, label = item
+            try:
+                self._emit_post(post, post_url, label)
+            except Exception as e:
+                print(f"[ERROR] Failed to emit {post_url}: {e}")
+
+    def _emit_post(self, post, post_url, label):
+        if self.diff_emitter is not None:
+            with self._lock:
+                self._diff_posts[post['uri']] = post['cid']
+            self.diff_emitter.set_post(post['uri'], post['cid'], [label] if label else [])
+            if len(self.diff_emitter) >= self.args.diff_batch:
+                self.flush_diff()
+            return
+        self.rate_limiter.wait()  # to be polite to the API
         print(f"\n🚨 Emitting label for post: {post_url}")
         try:
-            result = label_post(client, labeler_client, post_url, [label])
+            post_ref = Main(cid=post['cid'], uri=post['uri'])
+            result = label_post(self.client, self.labeler_client, post_url, [label], post=post_ref)
+            self.store.mark_emitted(post['uri'], post['cid'], self.labeler.ruleset_version)
             print("✅ Label emitted:", result)
         except Exception as e:
             print("❌ Failed to emit label:", e)
-        time.sleep(1)  # to be polite to the API
\ No newline at end of file
+            return
+        if self.aggregator is not None:
+            # at://<author did>/app.bsky.feed.post/<rkey>
+            self.aggregator.observe(post['uri'].split("/")[2], [label])
+
+    def flush_diff(self):
+        """Emit the label changes of all posts queued on the diff emitter"""
+        for row in self.diff_emitter.flush():
+            with self._lock:
+                cid = self._diff_posts.pop(row['subject'], None)
+            if row['status'] == 'failed':
+                print(f"❌ Failed to update labels of {row['subject']}:", row['error'])
+                continue
+            try:
+                if cid is not None:
+                    self.store.mark_emitted(row['subject'], cid, self.labeler.ruleset_version)
+                if row['status'] == 'emitted':
+                    print(f"✅ Labels updated for {row['subject']}: +{row['added']} -{row['negated']}")
+                if row['added'] and self.aggregator is not None:
+                    self.aggregator.observe(row['subject'].split("/")[2], row['added'])
+            except Exception as e:
+                print(f"[ERROR] Failed to record the label update of {row['subject']}: {e}")
+
+    @staticmethod
+    def _start(target, count):
+        threads = [threading.Thread(target=target, daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def run(self, keywords):
+        for keyword in keywords:
+            self.keywords.put(keyword)
+
+        collectors = self._start(self.collect, self.args.collect_workers)
+        classifiers = self._start(self.classify, self.args.classify_workers)
+        emitters = self._start(self.emit, self.args.emit_workers)
+
+        # Shut the stages down in order, one end marker per downstream worker
+        for thread in collectors:
+            thread.join()
+        for _ in classifiers:
+            self.to_classify.put(_DONE)
+        for thread in classifiers:
+            thread.join()
+        for _ in emitters:
+            self.to_emit.put(_DONE)
+        for thread in emitters:
+            thread.join()
+        if self.diff_emitter is not None:
+            self.flush_diff()
+
+
+def main():
+    """
+    Main function for the labeling pipeline
+    """
+    parser = argparse.ArgumentParser(description="Search, label and emit panic-language labels")
+    parser.add_argument("--max_posts", type=int, default=500)
+    parser.add_argument("--per_keyword_limit", type=int, default=50)
+    parser.add_argument("--collect_workers", type=int, default=3,
+                        help="Keywords searched concurrently")
+    parser.add_argument("--classify_workers", type=int, default=1)
+    parser.add_argument("--classify_batch", type=int, default=50,
+                        help="Queued posts looked up in the result store together")
+    parser.add_argument("--emit_workers", type=int, default=2)
+    parser.add_argument("--queue_size", type=int, default=100,
+                        help="Maximum posts waiting between two stages")
+    parser.add_argument("--emit_interval", type=float, default=1.0,
+                        help="Minimum seconds between label emissions across all emit workers")
+    parser.add_argument("--crawl_state", type=str, default=CRAWL_STATE,
+                        help="Search progress kept between runs so only new posts are fetched ('' to disable)")
+    parser.add_argument("--diff_labels", action="store_true",
+                        help="Only emit label changes, retracting stale labels, one event per post")
+    parser.add_argument("--diff_batch", type=int, default=50,
+                        help="Posts whose current labels are looked up together with --diff_labels")
+    parser.add_argument("--fingerprint_similarity", type=float, default=None,
+                        help="Reuse verdicts for near-duplicate posts at this similarity (e.g. 0.85)")
+    parser.add_argument("--account_threshold", type=float, default=None,
+                        help="Label an account once this many of its recent posts were labeled (off by default)")
+    parser.add_argument("--account_half_life_hours", type=float, default=24.0,
+                        help="Hours for a labeled post's weight towards the account threshold to halve")
+    parser.add_argument("--account_state", type=str, default=ACCOUNT_STATE,
+                        help="Checkpoint file of the per-account label counts")
+    args = parser.parse_args()
+
+    client = login_client(USERNAME, PASSWORD)
+    labeler_client = labeler_client_for(client)
+    cache = FingerprintCache(similarity=args.fingerprint_similarity) if args.fingerprint_similarity else None
+    labeler = PanicLanguageLabeler(keyword_threshold=2, fingerprint_cache=cache)
+    store = ResultStore(RESULT_STORE)
+
+    aggregator = None
+    if args.account_threshold:
+        def escalate(did, label):
+            print(f"\n🚨 Labeling account {did} as {label}")
+            label_did(labeler_client, did, [label])
+
+        aggregator = AccountAggregator(
+            threshold=args.account_threshold,
+            half_life=args.account_half_life_hours * 3600,
+            on_escalate=escalate,
+            checkpoint_path=args.account_state,
+        )
+
+    start = time.perf_counter()
+    crawl_state = CrawlState(args.crawl_state) if args.crawl_state else None
+    LabelingPipeline(client, labeler_client, labeler, store, args, aggregator, crawl_state).run(PANIC_KEYWORDS)
+    if aggregator is not None:
+        aggregator.save()
+        print("Account aggregation:", aggregator.stats())
+    if cache is not None:
+        print("Fingerprint cache:", cache.stats())
+    print(f"\nPipeline finished in {time.perf_counter() - start:.1f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Opt-in sampled profiling (cProfile + tracemalloc) of labeler runs"""
+
+import atexit
+import cProfile
+import io
+import multiprocessing
+import multiprocessing.util
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+# Profile every Nth call of each profiled method (unset or 0: profiling off)
+PROFILE_EVERY = int(os.getenv("PROFILE_EVERY", "0") or 0)
+# Report path prefix; <prefix>.pstats and <prefix>.txt are written at exit
+PROFILE_REPORT = os.getenv("PROFILE_REPORT", "labeler-profile")
+
+
+class SampledProfiler:
+    """
+    Times every call of the profiled sections and runs every Nth call of each
+    section under cProfile and tracemalloc.
+
+    Hot functions and allocation sites are aggregated across all sampled
+    calls, so the overhead of profiling is paid on a small fraction of posts
+    only. Only one call is sampled at a time; a call that is due while another
+    sample is running (e.g. a nested or concurrent section) defers sampling to
+    the next call of its section.
+    """
+
+    def __init__(self, every: int = 100, top_n: int = 25, frames: int = 1):
+        """
+        Initialize the profiler.
+
+        Args:
+            every: Sample one in this many calls of each section
+            top_n: Number of functions and allocation sites in the report
+            frames: Stack frames kept per allocation (1 groups by line)
+        """
+        self.every = max(1, every)
+        self.top_n = top_n
+        self.frames = frames
+        self.profile = cProfile.Profile()
+        # section -> [calls, total seconds, max seconds, sampled calls]
+        self.timings: Dict[str, list] = {}
+        # allocation site -> [net bytes, net blocks]
+        self.allocations: Dict[str, list] = {}
+        self._due: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+
+    def _start_sample(self, name: str) -> Optional[dict]:
+        with self._lock:
+            self._due[name] = self._due.get(name, 0) + 1
+            if self._due[name] < self.every or not self._sample_lock.acquire(blocking=False):
+                return None
+            self._due[name] = 0
+
+        sample = {"tracing": not tracemalloc.is_tracing(), "before": None, "profiling": False}
+        if sample["tracing"]:
+            tracemalloc.start(self.frames)
+        else:
+            # Someone else is tracing already: diff against the current state
+            sample["before"] = tracemalloc.take_snapshot()
+        try:
+            self.profile.enable()
+            sample["profiling"] = True
+        except ValueError as e:
+            # Another profiler (or sys.monitoring tool) is active
+            print(f"[INFO] cProfile unavailable for this sample: {e}")
+        return sample
+
+    def _finish_sample(self, sample: dict):
+        if sample["profiling"]:
+            self.profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if sample["tracing"]:
+            tracemalloc.stop()
+        self._sample_lock.release()
+
+        ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        snapshot = snapshot.filter_traces(ignored)
+        if sample["before"] is not None:
+            stats = snapshot.compare_to(sample["before"].filter_traces(ignored), "lineno")
+            deltas = [(str(stat.traceback), stat.size_diff, stat.count_diff) for stat in stats]
+        else:
+            stats = snapshot.statistics("lineno")
+            deltas = [(str(stat.traceback), stat.size, stat.count) for stat in stats]
+
+        with self._lock:
+            for site, size, count in deltas:
+                if size or count:
+                    totals = self.allocations.setdefault(site, [0, 0])
+                    totals[0] += size
+                    totals[1] += count
+
+    @contextmanager
+    def section(self, name: str):
+        """Time a call and, if it is due, profile it"""
+        sample = self._start_sample(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if sample is not None:
+                self._finish_sample(sample)
+            with self._lock:
+                timing = self.timings.setdefault(name, [0, 0.0, 0.0, 0])
+                timing[0] += 1
+                timing[1] += elapsed
+                timing[2] = max(timing[2], elapsed)
+                timing[3] += sample is not None
+
+    def report(self, path: Optional[str] = None) -> str:
+        """
+        Build the profiling report.
+
+        Args:
+            path: If given, write the aggregated cProfile data to
+                <path>.pstats and the report text to <path>.txt
+
+        Returns:
+            str: Section timings, hottest functions by cumulative time and
+            allocation sites with the most net bytes across sampled calls
+        """
+        out = io.StringIO()
+        with self._lock:
+            timings = sorted(self.timings.items(), key=lambda item: -item[1][1])
+            allocations = sorted(self.allocations.items(), key=lambda item: -abs(item[1][0]))
+
+        out.write(f"Labeler profile (every {self.every} calls sampled)\n\n")
+        out.write(f"{'section':<45} {'calls':>8} {'sampled':>8} {'mean ms':>10} {'max ms':>10}\n")
+        for name, (calls, total, longest, sampled) in timings:
+            out.write(f"{name:<45} {calls:>8} {sampled:>8} {total / calls * 1000:>10.3f} {longest * 1000:>10.3f}\n")
+
+        out.write(f"\nTop {self.top_n} functions by cumulative time (sampled calls)\n")
+        try:
+            stats = pstats.Stats(self.profile, stream=out)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+            if path:
+                stats.dump_stats(f"{path}.pstats")
+        except TypeError:
+            # pstats refuses a profile without any data
+            out.write("No calls were sampled\n")
+
+        out.write(f"\nTop {self.top_n} allocation sites by net size (sampled calls)\n")
+        for site, (size, count) in allocations[:self.top_n]:
+            out.write(f"{size / 1024:>10.1f} KiB {count:>8} blocks  {site}\n")
+
+        text = out.getvalue()
+        if path:
+            with open(f"{path}.txt", "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+
+_default_profiler = None
+# Process the default profiler was created in (a forked child starts its own)
+_default_pid = None
+_default_lock = threading.Lock()
+
+
+def _report_path() -> str:
+    # Worker processes each write their own report
+    if multiprocessing.parent_process() is not None:
+        return f"{PROFILE_REPORT}-{os.getpid()}"
+    return PROFILE_REPORT
+
+
+def _write_default_report():
+    path = _report_path()
+    _default_profiler.report(path)
+    print(f"[INFO] Profile written to {path}.txt and {path}.pstats")
+
+
+def default_profiler() -> Optional[SampledProfiler]:
+    """
+    The process-wide profiler configured by PROFILE_EVERY, or None if
+    profiling is off. Its report is written when the process exits.
+    """
+    global _default_profiler, _default_pid
+    if PROFILE_EVERY <= 0:
+        return None
+    with _default_lock:
+        if _default_profiler is None or _default_pid != os.getpid():
+            _default_profiler = SampledProfiler(every=PROFILE_EVERY)
+            _default_pid = os.getpid()
+            if multiprocessing.parent_process() is not None:
+                # Worker processes leave through os._exit, which skips atexit;
+                # multiprocessing runs its finalizers when a worker shuts down
+                multiprocessing.util.Finalize(None, _write_default_report, exitpriority=10)
+            else:
+                atexit.register(_write_default_report)
+        return _default_profiler
+
+
+def profiled(profiler: Optional[SampledProfiler], name: str):
+    """Context manager profiling a section, or doing nothing without a profiler"""
+    return profiler.section(name) if profiler is not None else nullcontext()
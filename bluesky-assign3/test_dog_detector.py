@@ -6,22 +6,24 @@ import os
 import argparse
 import csv
 import json
-from atproto import Client
 from dotenv import load_dotenv
 from dog_detector import DogImageDetector
-from image_extractor import ImageExtractor
+from image_extractor import BLOB_SOURCE, THUMBNAIL_SOURCE, ImageExtractor
 from pylabel.label import post_from_url
+from pylabel.session import login_client
 
 def main():
     parser = argparse.ArgumentParser(description="Test dog image detection")
     parser.add_argument("csv_file", help="CSV file with test cases")
     parser.add_argument("--images-dir", default="labeler-inputs/dog-list-images",
                        help="Directory with reference dog images")
+    parser.add_argument("--image-source", default=BLOB_SOURCE, choices=[BLOB_SOURCE, THUMBNAIL_SOURCE],
+                       help="Hash full-size blobs or CDN thumbnails")
     args = parser.parse_args()
     
     # Initialize components
     detector = DogImageDetector(args.images_dir)
-    extractor = ImageExtractor()
+    extractor = ImageExtractor(args.image_source)
     
     # Set up authenticated client
     load_dotenv(override=True)
@@ -33,9 +35,8 @@ def main():
         print("Please create a .env file with your Bluesky credentials")
         return
         
-    client = Client()
     try:
-        client.login(USERNAME, PW)
+        client = login_client(USERNAME, PW)
         print(f"Logged in as {USERNAME}")
     except Exception as e:
         print(f"Login failed: {e}")
@@ -75,7 +76,7 @@ def main():
                 is_dog = False
                 
                 for img_url in image_urls:
-                    if detector.is_dog_image_url(img_url):
+                    if detector.is_dog_image_url(img_url, extractor.fallback_urls(img_url)):
                         is_dog = True
                         break
                 
@@ -94,6 +95,7 @@ def main():
     # Print summary
     if total > 0:
         print(f"\nResults: {correct}/{total} correct ({correct/total:.2%})")
+        print(f"Downloaded {detector.bytes_downloaded / 1024:.1f} KiB of {args.image_source} images")
     else:
         print("\nNo test cases processed")
 
@@ -5,10 +5,12 @@ import json
 import os
 
 import pandas as pd
-from atproto import Client
 from dotenv import load_dotenv
 
-from pylabel import AutomatedLabeler, label_post, did_from_handle
+from pylabel import (
+    AutomatedLabeler, LabelDiffEmitter, ResultStore, label_post, labeler_client_for, login_client,
+    post_from_url
+)
 
 load_dotenv(override=True)
 USERNAME = os.getenv("USERNAME", "jaanvi-ts.bsky.social")
@@ -18,33 +20,71 @@ def main():
     """
     Main function for the test script
     """
-    client = Client()
+    client = login_client(USERNAME, PW)
     labeler_client = None
-    client.login(USERNAME, PW)
-    did = did_from_handle(USERNAME)
 
     parser = argparse.ArgumentParser()
     parser.add_argument("labeler_inputs_dir", type=str)
     parser.add_argument("input_urls", type=str)
     parser.add_argument("--emit_labels", action="store_true")
+    parser.add_argument("--result_store", type=str, default=None,
+                        help="SQLite file used to skip posts that were already labeled")
+    parser.add_argument("--image_source", type=str, default="blob", choices=["blob", "thumbnail"],
+                        help="Hash full-size blobs or CDN thumbnails")
+    parser.add_argument("--diff_labels", action="store_true",
+                        help="With --emit_labels, only add missing labels and retract stale ones")
     args = parser.parse_args()
 
     if args.emit_labels:
-        labeler_client = client.with_proxy("atproto_labeler", did)
+        labeler_client = labeler_client_for(client)
 
-    labeler = AutomatedLabeler(client, args.labeler_inputs_dir)
+    labeler = AutomatedLabeler(client, args.labeler_inputs_dir, image_source=args.image_source)
 
     urls = pd.read_csv(args.input_urls)
+    store = ResultStore(args.result_store) if args.result_store else None
+    decided = store.lookup_urls(urls["URL"], labeler.ruleset_version) if store else {}
+    diff_emitter = None
+    if args.emit_labels and args.diff_labels:
+        # Only retract our own rules' labels, not e.g. the panic labels from the same account
+        diff_emitter = LabelDiffEmitter(labeler_client, store, managed_labels=labeler.label_values)
     num_correct, total = 0, urls.shape[0]
     for _index, row in urls.iterrows():
         url, expected_labels = row["URL"], json.loads(row["Labels"])
-        labels = labeler.moderate_post(url)
+        post = None
+        if url in decided:
+            labels = decided[url].labels
+        else:
+            try:
+                post = post_from_url(client, url)
+            except Exception as e:
+                print(f"Error getting post: {e}")
+            labels = labeler.moderate_post_data(post)
+            if store and post:
+                store.record(post.uri, post.cid, labeler.ruleset_version, labels, url=url)
         if sorted(labels) == sorted(expected_labels):
             num_correct += 1
         else:
             print(f"For {url}, labeler produced {labels}, expected {expected_labels}")
+        if diff_emitter is not None:
+            subject = decided.get(url) or post
+            if subject:
+                diff_emitter.set_post(subject.uri, subject.cid, labels)
+            continue
         if args.emit_labels and (len(labels) > 0):
-            label_post(client, labeler_client, url, labels)
+            if url in decided and decided[url].emitted:
+                continue
+            label_post(client, labeler_client, url, labels, post=post)
+            if store and url in decided:
+                store.mark_emitted(decided[url].uri, decided[url].cid, labeler.ruleset_version)
+            elif store and post:
+                store.mark_emitted(post.uri, post.cid, labeler.ruleset_version)
+    if diff_emitter is not None:
+        rows = diff_emitter.flush()
+        changed = [row for row in rows if row["status"] == "emitted"]
+        failed = [row for row in rows if row["status"] == "failed"]
+        for row in failed:
+            print(f"Failed to update labels of {row['subject']}: {row['error']}")
+        print(f"Updated labels of {len(changed)} posts ({len(rows) - len(changed) - len(failed)} unchanged)")
     print(f"The labeler produced {num_correct} correct labels assignments out of {total}")
     print(f"Overall ratio of correct label assignments {num_correct/total}")
 
@@ -0,0 +1,104 @@
+"""Offline tests for the per-account label aggregator
+
+Run from bluesky-assign3/ with: python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from pylabel.account_aggregator import AccountAggregator
+
+LABEL = "likely-panic-language"
+HOUR = 3600
+
+
+class AccountAggregatorTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "account-counts.json")
+
+    def test_scores_decay_with_half_life(self):
+        aggregator = AccountAggregator(threshold=10, half_life=HOUR)
+        aggregator.observe("did:a", [LABEL], now=0)
+        aggregator.observe("did:a", [LABEL], now=0)
+        self.assertAlmostEqual(aggregator.score("did:a", LABEL, now=HOUR), 1.0)
+        self.assertAlmostEqual(aggregator.score("did:a", LABEL, now=2 * HOUR), 0.5)
+
+    def test_untracked_labels_are_ignored(self):
+        aggregator = AccountAggregator(threshold=1)
+        self.assertEqual(aggregator.observe("did:a", ["dog"], now=0), [])
+        self.assertEqual(aggregator.stats()["entries"], 0)
+
+    def test_escalates_once_at_threshold(self):
+        on_escalate = mock.Mock()
+        aggregator = AccountAggregator(threshold=2, half_life=HOUR, on_escalate=on_escalate)
+        self.assertEqual(aggregator.observe("did:a", [LABEL], now=0), [])
+        self.assertEqual(aggregator.observe("did:a", [LABEL], now=0), [LABEL])
+        self.assertEqual(aggregator.observe("did:a", [LABEL], now=0), [])
+        on_escalate.assert_called_once_with("did:a", LABEL)
+
+    def test_failed_escalation_is_retried(self):
+        on_escalate = mock.Mock(side_effect=[RuntimeError("rate limited"), None])
+        aggregator = AccountAggregator(threshold=1, on_escalate=on_escalate)
+        with mock.patch("builtins.print"):
+            self.assertEqual(aggregator.observe("did:a", [LABEL], now=0), [])
+        self.assertEqual(aggregator.stats()["escalated"], 0)
+        self.assertEqual(aggregator.observe("did:a", [LABEL], now=0), [LABEL])
+        self.assertEqual(aggregator.stats()["escalated"], 1)
+
+    def test_evicts_least_recently_updated(self):
+        aggregator = AccountAggregator(threshold=10, max_entries=2)
+        aggregator.observe("did:a", [LABEL], now=0)
+        aggregator.observe("did:b", [LABEL], now=1)
+        aggregator.observe("did:a", [LABEL], now=2)
+        aggregator.observe("did:c", [LABEL], now=3)
+        self.assertEqual(aggregator.score("did:b", LABEL, now=3), 0.0)
+        self.assertGreater(aggregator.score("did:a", LABEL, now=3), 1.0)
+        self.assertEqual(aggregator.stats()["evictions"], 1)
+
+    def test_checkpoint_round_trip(self):
+        aggregator = AccountAggregator(threshold=2, half_life=HOUR, checkpoint_path=self.path)
+        aggregator.observe("did:a", [LABEL], now=0)
+        aggregator.observe("did:a", [LABEL], now=0)
+        aggregator.observe("did:b", [LABEL], now=0)
+        aggregator.save()
+
+        restored = AccountAggregator(threshold=2, half_life=HOUR, checkpoint_path=self.path)
+        self.assertAlmostEqual(restored.score("did:a", LABEL, now=HOUR), 1.0)
+        self.assertEqual(restored.stats(), aggregator.stats())
+        # Already escalated before the restart
+        self.assertEqual(restored.observe("did:a", [LABEL], now=0), [])
+
+    def test_concurrent_checkpoints_escalate_every_pair(self):
+        escalated = []
+        aggregator = AccountAggregator(threshold=1, on_escalate=lambda did, label: escalated.append(did),
+                                       checkpoint_path=self.path, checkpoint_every=1, checkpoint_interval=0)
+        errors = []
+
+        def observe(worker):
+            for i in range(50):
+                try:
+                    aggregator.observe(f"did:{worker}-{i}", [LABEL])
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=observe, args=(worker,)) for worker in range(4)]
+        with mock.patch("builtins.print") as printed:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        printed.assert_not_called()
+        self.assertEqual(len(escalated), 200)
+        aggregator.save()
+        self.assertEqual(AccountAggregator(checkpoint_path=self.path).stats()["escalated"], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Offline tests for the streaming, resumable backfill
+
+Run from bluesky-assign3/ with: python -m unittest discover tests
+"""
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import backfill
+
+TEXTS = [
+    "EMERGENCY!!! evacuate now",
+    "a calm post about gardening",
+    "breaking: urgent alert,\nact now before it is too late",
+    "déjà vu — \"quoted\" text, with commas",
+    "",
+    "critical danger, do not ignore this warning",
+    "lunch was good",
+]
+
+
+class BackfillTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.input = os.path.join(self.dir, "posts.csv")
+        with open(self.input, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "text"])
+            for i, text in enumerate(TEXTS * 3):
+                writer.writerow([i, text])
+        patcher = mock.patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def output(self, name):
+        return os.path.join(self.dir, name)
+
+    def run_backfill(self, output, **kwargs):
+        return backfill.run_backfill(self.input, output, chunk_size=4, **kwargs)
+
+    def test_read_chunks_resumes_from_byte_offset(self):
+        chunks = list(backfill.read_chunks(self.input, "text", 4))
+        rows = [row for chunk, _offset in chunks for row in chunk]
+        self.assertEqual([text for _index, text in rows], TEXTS * 3)
+
+        first, offset = chunks[0]
+        resumed = list(backfill.read_chunks(self.input, "text", 4, skip=len(first), offset=offset))
+        self.assertEqual([row for chunk, _offset in resumed for row in chunk], rows[len(first):])
+
+    def test_interrupted_run_resumes_without_duplicates(self):
+        expected = self.output("full.csv")
+        self.assertEqual(self.run_backfill(expected), len(TEXTS) * 3)
+
+        resumed = self.output("resumed.csv")
+        label_chunk = backfill.label_chunk
+        calls = []
+
+        def fail_on_third_chunk(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return label_chunk(*args, **kwargs)
+
+        with mock.patch.object(backfill, "label_chunk", side_effect=fail_on_third_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_backfill(resumed)
+        with open(resumed + ".checkpoint.json", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint["rows_done"], 8)
+        self.assertGreater(checkpoint["input_bytes"], 0)
+
+        # The resumed run seeks past the labeled rows instead of re-parsing them
+        with mock.patch.object(backfill, "read_chunks", wraps=backfill.read_chunks) as read_chunks:
+            self.assertEqual(self.run_backfill(resumed), len(TEXTS) * 3)
+        self.assertEqual(read_chunks.call_args.kwargs["offset"], checkpoint["input_bytes"])
+        with open(expected, encoding="utf-8") as a, open(resumed, encoding="utf-8") as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_refuses_to_overwrite_output_without_checkpoint(self):
+        output = self.output("existing.csv")
+        with open(output, "w", encoding="utf-8") as f:
+            f.write("precious results\n")
+        with self.assertRaises(FileExistsError):
+            self.run_backfill(output)
+        with open(output, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "precious results\n")
+
+        self.assertEqual(self.run_backfill(output, force=True), len(TEXTS) * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+"""Offline tests for resumable search crawls
+
+Run from bluesky-assign3/ with: python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from itertools import islice
+from types import SimpleNamespace
+from unittest import mock
+
+import create_csv
+from pylabel.crawl_state import BloomFilter, CrawlState
+
+PAGE_SIZE = 25
+
+
+def make_post(i):
+    return SimpleNamespace(
+        uri=f"at://did:plc:alice/app.bsky.feed.post/{i}",
+        cid=f"c{i}",
+        indexed_at=f"2026-01-01T00:00:{i:04d}Z",
+        record=SimpleNamespace(text=f"emergency evacuate now {i}"),
+        author=SimpleNamespace(handle="alice.bsky.social"),
+    )
+
+
+class FakeClient:
+    """search_posts over an in-memory, newest-first result list with offset cursors"""
+
+    def __init__(self, count):
+        self.posts = [make_post(i) for i in range(count - 1, -1, -1)]
+        self.calls = []
+        self.app = SimpleNamespace(bsky=SimpleNamespace(feed=SimpleNamespace(search_posts=self.search_posts)))
+
+    def publish(self, first, count):
+        self.posts[:0] = [make_post(i) for i in range(first + count - 1, first - 1, -1)]
+
+    def search_posts(self, params):
+        offset = int(params["cursor"] or 0)
+        self.calls.append(offset)
+        end = offset + PAGE_SIZE
+        return SimpleNamespace(posts=self.posts[offset:end], cursor=str(end) if end < len(self.posts) else None)
+
+
+class CrawlTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "crawl-state.json")
+        patcher = mock.patch.object(create_csv.time, "sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def crawl(self, client, limit=1000):
+        # A fresh CrawlState per run, restored from the file like a new process
+        state = CrawlState(self.path, window_size=1000, windows=2)
+        posts = create_csv.iter_search_posts(["emergency"], max_posts=1000, per_keyword_limit=limit,
+                                             client=client, state=state)
+        with mock.patch("builtins.print"):
+            return [int(post["rkey"]) for post in posts], state.keyword("emergency")
+
+    def test_interrupted_first_sweep_becomes_the_watermark(self):
+        client = FakeClient(100)
+        got, progress = self.crawl(client, limit=30)
+        self.assertEqual(got, list(range(99, 69, -1)))
+        self.assertIsNone(progress["cursor"])
+        self.assertEqual(progress["newest_seen"], make_post(99).indexed_at)
+
+        # The next run only fetches what was published since, from the top
+        client.publish(100, 5)
+        client.calls.clear()
+        got, _ = self.crawl(client)
+        self.assertEqual(got, list(range(104, 99, -1)))
+        self.assertEqual(client.calls, [0])
+
+    def test_interrupted_sweep_resumes_without_gaps_or_repeats(self):
+        client = FakeClient(10)
+        self.crawl(client)
+        client.publish(10, 60)
+
+        first, progress = self.crawl(client, limit=30)
+        self.assertEqual(progress["cursor"], "25")
+        self.assertTrue(progress["partial_page"])
+        second, progress = self.crawl(client, limit=40)
+        self.assertEqual(sorted(first + second), list(range(10, 70)))
+        self.assertEqual(len(set(first + second)), 60)
+        self.assertIsNone(progress["cursor"])
+        self.assertEqual(progress["newest_seen"], make_post(69).indexed_at)
+
+    def crawl_and_close(self, client, count):
+        # The pipeline stops a search at --max_posts by closing the generator
+        state = CrawlState(self.path, window_size=1000, windows=2)
+        posts = create_csv.iter_search_posts(["emergency"], client=client, state=state)
+        with mock.patch("builtins.print"):
+            got = [int(post["rkey"]) for post in islice(posts, count)]
+            posts.close()
+        return got, CrawlState(self.path).keyword("emergency")
+
+    def test_closed_first_sweep_becomes_the_watermark(self):
+        client = FakeClient(1000)
+        got, progress = self.crawl_and_close(client, 30)
+        self.assertEqual(got, list(range(999, 969, -1)))
+        self.assertIsNone(progress["cursor"])
+        self.assertEqual(progress["newest_seen"], make_post(999).indexed_at)
+
+        client.publish(1000, 10)
+        client.calls.clear()
+        got, _ = self.crawl_and_close(client, 30)
+        self.assertEqual(got, list(range(1009, 999, -1)))
+        self.assertEqual(client.calls, [0])
+
+    def test_closed_search_resumes_its_page(self):
+        client = FakeClient(10)
+        self.crawl(client)
+        client.publish(10, 60)
+
+        first, progress = self.crawl_and_close(client, 30)
+        self.assertEqual(progress["cursor"], "25")
+        self.assertTrue(progress["partial_page"])
+
+        second, progress = self.crawl(client)
+        self.assertEqual(sorted(first + second), list(range(10, 70)))
+        self.assertEqual(len(first + second), 60)
+        self.assertIsNone(progress["cursor"])
+
+    def test_nothing_new(self):
+        client = FakeClient(40)
+        self.crawl(client)
+        client.calls.clear()
+        got, _ = self.crawl(client)
+        self.assertEqual(got, [])
+        self.assertEqual(client.calls, [0])
+
+    def test_seen_filter_only_checked_on_resumed_page(self):
+        client = FakeClient(10)
+        self.crawl(client)
+        client.publish(10, 60)
+        # Even a filter that claims every URI was seen cannot hide new posts
+        with mock.patch.object(CrawlState, "is_seen", return_value=True):
+            got, _ = self.crawl(client)
+        self.assertEqual(got, list(range(69, 9, -1)))
+
+
+class BloomFilterTest(unittest.TestCase):
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(10000, 0.001)
+        for i in range(10000):
+            bloom.add(f"in-{i}")
+        self.assertTrue(all(f"in-{i}" in bloom for i in range(10000)))
+        false_positives = sum(f"out-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
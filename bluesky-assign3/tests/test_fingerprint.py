@@ -0,0 +1,98 @@
+"""Offline tests for the SimHash fingerprint cache
+
+Run from bluesky-assign3/ with: python -m unittest discover tests
+"""
+
+import unittest
+
+from policy_proposal_labeler import PANIC_LABEL, PanicLanguageLabeler
+from pylabel.fingerprint import (
+    FINGERPRINT_BITS, FingerprintCache, hamming_distance, simhash_text
+)
+
+POST = "there is an emergency near the river please stay safe and check on your neighbours tonight"
+
+
+class SimHashTest(unittest.TestCase):
+    def test_near_duplicates_are_close(self):
+        a = simhash_text(POST)
+        b = simhash_text(POST.replace("tonight", "today"))
+        c = simhash_text("completely unrelated post about my cat sleeping on the keyboard again")
+        self.assertLessEqual(hamming_distance(a, b), 9)
+        self.assertGreater(hamming_distance(a, c), 9)
+
+    def test_fingerprint_fits_in_bits(self):
+        self.assertLess(simhash_text(POST), 1 << FINGERPRINT_BITS)
+
+
+class FingerprintCacheTest(unittest.TestCase):
+    def test_exact_and_near_hits(self):
+        cache = FingerprintCache(similarity=0.85)
+        fingerprint = simhash_text(POST)
+        self.assertIsNone(cache.lookup(fingerprint))
+        cache.store(fingerprint, ["x"], evidence={"score": 3})
+
+        hit = cache.lookup(fingerprint)
+        self.assertEqual(hit.labels, ["x"])
+        self.assertEqual(hit.distance, 0)
+
+        near = simhash_text(POST.replace("tonight", "today"))
+        self.assertEqual(cache.lookup(near).labels, ["x"])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_banding_finds_every_fingerprint_within_max_distance(self):
+        cache = FingerprintCache(similarity=0.85)
+        base = 0x0123456789ABCDEF
+        cache.store(base, ["x"])
+        # Flipping max_distance bits spread over all bands must still hit
+        step = FINGERPRINT_BITS // cache.max_distance
+        flipped = base
+        for bit in range(0, step * cache.max_distance, step):
+            flipped ^= 1 << bit
+        self.assertEqual(hamming_distance(base, flipped), cache.max_distance)
+        self.assertIsNotNone(cache.lookup(flipped))
+        self.assertIsNone(cache.lookup(base ^ ((1 << (cache.max_distance + 1)) - 1)))
+
+    def test_namespaces_do_not_share_verdicts(self):
+        cache = FingerprintCache()
+        fingerprint = simhash_text(POST)
+        cache.store(fingerprint, ["x"], namespace=("a.com",))
+        self.assertIsNone(cache.lookup(fingerprint, namespace=("b.com",)))
+        self.assertIsNotNone(cache.lookup(fingerprint, namespace=("a.com",)))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = FingerprintCache(max_entries=2, similarity=1.0)
+        cache.store(1, ["one"])
+        cache.store(2, ["two"])
+        cache.lookup(1)
+        cache.store(3, ["three"])
+        self.assertIsNotNone(cache.lookup(1))
+        self.assertIsNone(cache.lookup(2))
+        self.assertIsNotNone(cache.lookup(3))
+        self.assertEqual(cache.stats()["entries"], 2)
+        # Evicted fingerprints are removed from the band index too
+        self.assertFalse(any(2 in band for band in cache._bands.values()))
+
+
+class PanicLabelerCacheTest(unittest.TestCase):
+    def test_cache_keeps_style_signals(self):
+        calm = "there is an emergency in town tonight, everyone please stay home"
+        alarmed = "there is an EMERGENCY in town tonight, everyone please stay home 🚨!!!"
+        cached = PanicLanguageLabeler(fingerprint_cache=FingerprintCache())
+        uncached = PanicLanguageLabeler()
+
+        self.assertIsNone(cached.moderate_post(calm))
+        self.assertEqual(cached.moderate_post(alarmed), uncached.moderate_post(alarmed))
+        self.assertEqual(cached.moderate_post(alarmed), PANIC_LABEL)
+
+    def test_cache_reuses_verdict_for_copies(self):
+        cache = FingerprintCache()
+        labeler = PanicLanguageLabeler(fingerprint_cache=cache)
+        text = "BREAKING: evacuate the coast now, this is an emergency!!!"
+        labeler.moderate_post(text)
+        self.assertEqual(labeler.moderate_post(text + " "), PANIC_LABEL)
+        self.assertEqual(cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Offline tests for diff-based label emission
+
+Run from bluesky-assign3/ with: python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pylabel import label_diff
+from pylabel.label_diff import LabelDiffEmitter
+from pylabel.result_store import ResultStore
+
+POST = "at://did:plc:alice/app.bsky.feed.post/1"
+OTHER = "at://did:plc:alice/app.bsky.feed.post/2"
+
+
+class LabelDiffEmitterTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ResultStore(os.path.join(tmp.name, "results.sqlite"))
+        for name in ("Main", "RepoRef"):
+            patcher = mock.patch.object(label_diff, name, side_effect=lambda **ref: ref)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(label_diff, "emit_label_event")
+        self.emit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def emitted(self):
+        return {call.args[1].get("uri") or call.args[1]["did"]: (call.args[2], call.args[3])
+                for call in self.emit.call_args_list}
+
+    def test_adds_missing_and_negates_stale_labels(self):
+        self.store.set_applied_labels(POST, ["t-and-s", "dog"])
+        emitter = LabelDiffEmitter(None, self.store, query=False)
+        emitter.set_post(POST, "c1", ["dog", "bbc"])
+        rows = emitter.flush()
+
+        self.assertEqual(rows[0]["status"], "emitted")
+        self.assertEqual(self.emitted(), {POST: (["bbc"], ["t-and-s"])})
+        self.assertEqual(self.store.applied_labels([POST]), {POST: {"dog", "bbc"}})
+
+    def test_unchanged_subjects_get_no_event(self):
+        self.store.set_applied_labels(POST, ["dog"])
+        emitter = LabelDiffEmitter(None, self.store, query=False)
+        emitter.set_post(POST, "c1", ["dog"])
+        self.assertEqual(emitter.flush()[0]["status"], "unchanged")
+        self.emit.assert_not_called()
+
+    def test_only_managed_labels_are_negated(self):
+        self.store.set_applied_labels(POST, ["likely-panic-language", "t-and-s"])
+        emitter = LabelDiffEmitter(None, self.store, managed_labels=["t-and-s", "dog"], query=False)
+        emitter.set_post(POST, "c1", [])
+        emitter.flush()
+        self.assertEqual(self.emitted(), {POST: ([], ["t-and-s"])})
+
+    def test_requeued_subject_gets_one_merged_event(self):
+        emitter = LabelDiffEmitter(None, self.store, query=False)
+        emitter.set_post(POST, "c1", ["dog"])
+        emitter.set_post(POST, "c1", ["t-and-s"])
+        emitter.set_account("did:plc:alice", ["likely-panic-language"])
+        self.assertEqual(len(emitter), 2)
+        emitter.flush()
+        self.assertEqual(self.emitted(), {
+            POST: (["dog", "t-and-s"], []),
+            "did:plc:alice": (["likely-panic-language"], []),
+        })
+        self.assertEqual(len(emitter), 0)
+
+    def test_unknown_subjects_are_queried_in_bulk(self):
+        self.store.set_applied_labels(POST, ["dog"])
+        with mock.patch.object(label_diff, "query_labels", return_value={OTHER: {"dog"}}) as query:
+            emitter = LabelDiffEmitter(None, self.store)
+            emitter.set_post(POST, "c1", ["dog"])
+            emitter.set_post(OTHER, "c2", [])
+            emitter.flush()
+        query.assert_called_once_with(None, [OTHER])
+        self.assertEqual(self.emitted(), {OTHER: ([], ["dog"])})
+
+    def test_failed_event_is_not_recorded(self):
+        self.emit.side_effect = RuntimeError("rate limited")
+        emitter = LabelDiffEmitter(None, self.store, query=False)
+        emitter.set_post(POST, "c1", ["dog"])
+        row = emitter.flush()[0]
+        self.assertEqual((row["status"], row["error"]), ("failed", "rate limited"))
+        self.assertEqual(self.store.applied_labels([POST]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""Offline tests for the stages of the real-time labeling pipeline
+
+Run from bluesky-assign3/ with: python -m unittest discover tests
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import run_labeling_pipeline
+from run_labeling_pipeline import _DONE, LabelingPipeline
+
+ARGS = SimpleNamespace(queue_size=100, emit_interval=0.0, diff_labels=False, diff_batch=50,
+                       classify_batch=50, max_posts=100, per_keyword_limit=50)
+
+
+def make_post(i, text="emergency alert"):
+    return {"creator": "alice.bsky.social", "rkey": f"r{i}", "uri": f"at://did:plc:alice/app.bsky.feed.post/r{i}",
+            "cid": f"c{i}", "text": text}
+
+
+class FakeStore:
+    def __init__(self):
+        self.lookups = []
+        self.recorded = []
+
+    def lookup_urls(self, urls, version):
+        self.lookups.append(list(urls))
+        return {}
+
+    def record(self, uri, cid, version, labels, url=None):
+        self.recorded.append(uri)
+
+    def mark_emitted(self, uri, cid, version):
+        pass
+
+
+class FakeLabeler:
+    ruleset_version = "test"
+
+    def moderate_post(self, text):
+        if text == "boom":
+            raise RuntimeError("labeler bug")
+        return "likely-panic-language"
+
+
+def make_pipeline(aggregator=None):
+    return LabelingPipeline(None, None, FakeLabeler(), FakeStore(), ARGS, aggregator)
+
+
+class CollectTest(unittest.TestCase):
+    def test_no_pulled_post_is_dropped_at_the_limit(self):
+        pulled = []
+
+        def search(keywords, **kwargs):
+            for i in range(10):
+                pulled.append(i)
+                yield make_post(i)
+
+        pipeline = LabelingPipeline(None, None, FakeLabeler(), FakeStore(),
+                                    SimpleNamespace(**{**vars(ARGS), "max_posts": 3}))
+        pipeline.keywords.put("emergency")
+        pipeline.keywords.put("alert")
+        with mock.patch.object(run_labeling_pipeline, "iter_search_posts", side_effect=search):
+            pipeline.collect()
+
+        # Every post taken from the search (and so marked crawled) is queued
+        self.assertEqual(len(pulled), 3)
+        self.assertEqual(pipeline.to_classify.qsize(), 3)
+
+    def test_exhausted_search_frees_its_slot(self):
+        def search(keywords, **kwargs):
+            yield make_post(len(keywords[0]))
+
+        pipeline = LabelingPipeline(None, None, FakeLabeler(), FakeStore(),
+                                    SimpleNamespace(**{**vars(ARGS), "max_posts": 2}))
+        pipeline.keywords.put("emergency")
+        pipeline.keywords.put("alert")
+        with mock.patch.object(run_labeling_pipeline, "iter_search_posts", side_effect=search):
+            pipeline.collect()
+
+        self.assertEqual(pipeline.to_classify.qsize(), 2)
+
+
+class ClassifyTest(unittest.TestCase):
+    def test_queued_posts_share_one_lookup(self):
+        pipeline = make_pipeline()
+        for i in range(3):
+            pipeline.to_classify.put(make_post(i))
+        pipeline.to_classify.put(_DONE)
+        pipeline.classify()
+
+        self.assertEqual(len(pipeline.store.lookups), 1)
+        self.assertEqual(len(pipeline.store.lookups[0]), 3)
+        self.assertEqual(pipeline.to_emit.qsize(), 3)
+
+    def test_failing_post_does_not_stop_the_worker(self):
+        pipeline = make_pipeline()
+        pipeline.to_classify.put(make_post(0, text="boom"))
+        pipeline.to_classify.put(make_post(1))
+        pipeline.to_classify.put(_DONE)
+        pipeline.classify()
+
+        self.assertEqual(pipeline.store.recorded, [make_post(1)["uri"]])
+        self.assertEqual(pipeline.to_emit.get_nowait()[0]["rkey"], "r1")
+
+
+class EmitTest(unittest.TestCase):
+    def test_failing_post_does_not_stop_the_worker(self):
+        aggregator = mock.Mock()
+        aggregator.observe.side_effect = [OSError("disk full"), []]
+        pipeline = make_pipeline(aggregator)
+        for i in range(2):
+            pipeline.to_emit.put((make_post(i), f"url{i}", "likely-panic-language"))
+        pipeline.to_emit.put(_DONE)
+        with mock.patch.object(run_labeling_pipeline, "Main"), \
+                mock.patch.object(run_labeling_pipeline, "label_post", return_value="ok") as label_post:
+            pipeline.emit()
+
+        self.assertEqual(label_post.call_count, 2)
+        self.assertEqual(aggregator.observe.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
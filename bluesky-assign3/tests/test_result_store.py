@@ -0,0 +1,52 @@
+"""Offline tests for the SQLite result store
+
+Run from bluesky-assign3/ with: python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pylabel import result_store
+from pylabel.result_store import ResultStore
+
+URI = "at://did:plc:alice/app.bsky.feed.post/1"
+URL = "https://bsky.app/profile/alice.bsky.social/post/1"
+
+
+class ResultStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ResultStore(os.path.join(tmp.name, "results.sqlite"))
+        self.addCleanup(self.store.close)
+
+    def record(self, cid, labels, at):
+        with mock.patch.object(result_store.time, "time", return_value=at):
+            self.store.record(URI, cid, "v1", labels, url=URL)
+
+    def test_lookup_returns_latest_result_of_url(self):
+        # Inserted out of time order, so insertion order cannot decide
+        self.record("c2", ["dog"], at=200)
+        self.record("c1", ["t-and-s"], at=100)
+        self.assertEqual(self.store.lookup_urls([URL], "v1")[URL].cid, "c2")
+
+        self.record("c1", [], at=300)
+        self.assertEqual(self.store.lookup_urls([URL], "v1")[URL].cid, "c1")
+
+    def test_lookup_is_per_ruleset_version(self):
+        self.record("c1", ["dog"], at=100)
+        self.assertEqual(self.store.lookup_urls([URL], "v2"), {})
+        self.assertEqual(self.store.filter_undecided([URL, "other"], "v1"), ["other"])
+
+    def test_emitted_flag(self):
+        self.record("c1", ["dog"], at=100)
+        self.assertFalse(self.store.lookup_urls([URL], "v1")[URL].emitted)
+        self.store.mark_emitted(URI, "c1", "v1")
+        self.assertTrue(self.store.is_emitted(URI, "c1", "v1"))
+        self.assertEqual(self.store.get(URI, "c1", "v1"), ["dog"])
+
+
+if __name__ == "__main__":
+    unittest.main()
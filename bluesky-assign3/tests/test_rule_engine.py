@@ -0,0 +1,104 @@
+"""Offline tests for the cost-aware rule engine
+
+Run from bluesky-assign3/ with: python -m unittest discover tests
+"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from pylabel.rule_engine import EXPENSIVE_COST, Rule, RuleEngine
+
+
+def constant(*labels):
+    return lambda _value: list(labels)
+
+
+class RuleEngineTest(unittest.TestCase):
+    def run_engine(self, rules, inputs):
+        engine = RuleEngine(rules)
+        self.addCleanup(engine.shutdown)
+        return engine.run(inputs)
+
+    def test_labels_merge_in_declaration_order(self):
+        rules = [
+            Rule("slow", cost=EXPENSIVE_COST, input="text", evaluate=constant("a", "b")),
+            Rule("cheap", cost=1, input="text", evaluate=constant("b", "c")),
+            Rule("cheaper", cost=0, input="text", evaluate=constant("d")),
+        ]
+        self.assertEqual(self.run_engine(rules, {"text": "x"}), ["a", "b", "c", "d"])
+
+    def test_rules_with_missing_input_are_skipped(self):
+        evaluate = mock.Mock(return_value=["dog"])
+        rules = [Rule("images", cost=EXPENSIVE_COST, input="image_urls", evaluate=evaluate)]
+        self.assertEqual(self.run_engine(rules, {"image_urls": []}), [])
+        evaluate.assert_not_called()
+
+    def test_cheap_terminal_rule_short_circuits(self):
+        later = mock.Mock(return_value=["b"])
+        rules = [
+            Rule("terminal", cost=1, input="text", evaluate=constant("t"), terminal=True),
+            Rule("later", cost=2, input="text", evaluate=later),
+        ]
+        self.assertEqual(self.run_engine(rules, {"text": "x"}), ["t"])
+        later.assert_not_called()
+
+    def test_expensive_terminal_rule_replaces_labels(self):
+        rules = [
+            Rule("text", cost=1, input="text", evaluate=constant("t-and-s")),
+            Rule("dog", cost=EXPENSIVE_COST, input="image_urls", evaluate=lambda url: ["dog"] if url == "b" else [],
+                 terminal=True, per_item=True),
+        ]
+        self.assertEqual(self.run_engine(rules, {"text": "x", "image_urls": ["a", "b"]}), ["dog"])
+        self.assertEqual(self.run_engine(rules, {"text": "x", "image_urls": ["a"]}), ["t-and-s"])
+
+    def test_terminal_match_cancels_running_items(self):
+        started = threading.Event()
+        stopped_early = []
+
+        def check(url, cancelled):
+            if url == "dog":
+                started.wait(1)
+                return ["dog"]
+            started.set()
+            stopped_early.append(cancelled.wait(2))
+            return []
+
+        rules = [Rule("dog", cost=EXPENSIVE_COST, input="image_urls", evaluate=check,
+                      terminal=True, per_item=True, cancellable=True)]
+        start = time.perf_counter()
+        self.assertEqual(self.run_engine(rules, {"image_urls": ["slow", "dog"]}), ["dog"])
+        self.assertLess(time.perf_counter() - start, 1.5)
+        started.wait(1)
+        time.sleep(0.05)
+        self.assertEqual(stopped_early, [True])
+
+    def test_failing_rule_yields_no_labels(self):
+        rules = [
+            Rule("broken", cost=1, input="text", evaluate=mock.Mock(side_effect=ValueError("bad"))),
+            Rule("ok", cost=1, input="text", evaluate=constant("t-and-s")),
+        ]
+        with mock.patch("builtins.print"):
+            self.assertEqual(self.run_engine(rules, {"text": "x"}), ["t-and-s"])
+
+    def test_pool_is_created_once_across_threads(self):
+        engine = RuleEngine([Rule("slow", cost=EXPENSIVE_COST, input="text", evaluate=constant("a"))])
+        self.addCleanup(engine.shutdown)
+        pools = []
+        barrier = threading.Barrier(8)
+
+        def create():
+            barrier.wait()
+            pools.append(engine._pool())
+
+        threads = [threading.Thread(target=create) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(pool) for pool in pools}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()